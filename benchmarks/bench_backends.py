@@ -0,0 +1,108 @@
+"""
+推理后端对比: 场景边界与 float SavedModel 的一致性，以及速度
+
+每个后端对同一批帧 (给定的视频文件，或未指定时生成的带硬切的合成帧) 推理，
+以 savedmodel 为参照报告:
+  - frames/sec 与相对 savedmodel 的加速比
+  - single_frame_pred 的最大绝对误差
+  - 场景边界 (场景起始帧) 的 precision / recall / F1，允许 --tolerance 帧的偏差
+  - 场景列表完全相同的视频数
+
+用法 (在项目根目录下):
+    python -m benchmarks.bench_backends --weights transnetv2-weights/ videos/*.mp4
+    python -m benchmarks.bench_backends --backends savedmodel tflite-int8 --synthetic 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from core.backends import BACKENDS
+from transnetv2 import TransNetV2
+
+
+def synthetic_video(rng, shots=12):
+    # still shots with a little noise and drift, separated by hard cuts
+    frames = []
+    for _ in range(shots):
+        length = int(rng.integers(20, 200))
+        base = rng.integers(0, 256, (27, 48, 3)).astype(np.int16)
+        drift = np.linspace(0, rng.integers(-40, 40), length).astype(np.int16)[:, None, None, None]
+        noise = rng.integers(-8, 8, (length, 27, 48, 3), dtype=np.int16)
+        frames.append(np.clip(base[None] + drift + noise, 0, 255).astype(np.uint8))
+    return np.concatenate(frames)
+
+
+def boundaries(scenes):
+    return scenes[1:, 0] if len(scenes) > 1 else np.zeros(0, np.int32)
+
+
+def match_boundaries(reference, candidate, tolerance):
+    # greedy one-to-one matching of boundaries at most `tolerance` frames apart
+    used = np.zeros(len(candidate), bool)
+    matched = 0
+    for b in reference:
+        distances = np.where(used, np.inf, np.abs(candidate - b))
+        if len(distances) and distances.min() <= tolerance:
+            used[np.argmin(distances)] = True
+            matched += 1
+    return matched
+
+
+def run_backend(name, weights, videos, batch_size, threshold, cache_dir):
+    model = TransNetV2(weights, batch_size=batch_size, backend=name, cache_dir=cache_dir)
+    model.warmup()
+    start = time.perf_counter()
+    predictions = [model.predict_frames(frames)[0] for frames in videos]
+    seconds = time.perf_counter() - start
+    scenes = [TransNetV2.predictions_to_scenes(p, threshold) for p in predictions]
+    return predictions, scenes, sum(len(v) for v in videos) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="videos to compare on (default: synthetic clips)")
+    parser.add_argument("--weights", type=str, default=None,
+                        help="path to TransNet V2 weights, tries to infer the location if not specified")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--tolerance", type=int, default=2, help="frames a boundary may move and still match")
+    parser.add_argument("--synthetic", type=int, default=10, help="number of synthetic clips without files")
+    parser.add_argument("--cache-dir", type=str, default=None, help="where converted models are cached")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.files:
+        decoder = TransNetV2(args.weights)
+        videos = [decoder.extract_frames(path) for path in args.files]
+    else:
+        rng = np.random.default_rng(args.seed)
+        videos = [synthetic_video(rng) for _ in range(args.synthetic)]
+
+    results = {}
+    for name in ["savedmodel"] + [b for b in args.backends if b != "savedmodel"]:
+        results[name] = run_backend(name, args.weights, videos, args.batch_size, args.threshold, args.cache_dir)
+
+    ref_predictions, ref_scenes, ref_fps = results["savedmodel"]
+    print(f"{len(videos)} videos, {sum(len(v) for v in videos)} frames, threshold {args.threshold}")
+    print(f"{'backend':>12} {'frames/sec':>11} {'speedup':>8} {'max |diff|':>11} "
+          f"{'precision':>10} {'recall':>7} {'F1':>6} {'identical':>10}")
+    for name, (predictions, scenes, fps) in results.items():
+        diff = max(np.abs(a - b).max(initial=0) for a, b in zip(predictions, ref_predictions))
+        ref_total = cand_total = matched = identical = 0
+        for ref, cand in zip(ref_scenes, scenes):
+            ref_b, cand_b = boundaries(ref), boundaries(cand)
+            ref_total += len(ref_b)
+            cand_total += len(cand_b)
+            matched += match_boundaries(ref_b, cand_b, args.tolerance)
+            identical += np.array_equal(ref, cand)
+        precision = matched / cand_total if cand_total else 1.0
+        recall = matched / ref_total if ref_total else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        print(f"{name:>12} {fps:>11.1f} {fps / ref_fps:>7.2f}x {diff:>11.2e} "
+              f"{precision:>10.3f} {recall:>7.3f} {f1:>6.3f} {identical:>5}/{len(videos)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+TransNetV2 多窗口批量推理基准
+
+用随机帧测量不同 batch_size 下 `predict_frames` 的吞吐 (frames/sec)。
+
+用法 (在项目根目录下):
+    python -m benchmarks.bench_batch_size --frames 3000 --batch-sizes 1 2 4 8 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from transnetv2 import TransNetV2
+
+
+def bench(model, frames, batch_size, repeats):
+    # warm-up so graph tracing / allocation for this batch shape is not timed
+    model.predict_frames(frames[:50 * batch_size], batch_size=batch_size)
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_frames(frames, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", type=str, default=None,
+                        help="path to TransNet V2 weights, tries to infer the location if not specified")
+    parser.add_argument("--frames", type=int, default=3000, help="number of synthetic frames")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    model = TransNetV2(args.weights)
+    frames = np.random.default_rng(0).integers(0, 256, (args.frames, 27, 48, 3), dtype=np.uint8)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        results.append((batch_size, bench(model, frames, batch_size, args.repeats)))
+
+    baseline = results[0][1]
+    print(f"{'batch':>6} {'frames/sec':>12} {'speedup':>8}")
+    for batch_size, fps in results:
+        print(f"{batch_size:>6} {fps:>12.1f} {fps / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
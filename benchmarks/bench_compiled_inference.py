@@ -0,0 +1,62 @@
+"""
+TransNetV2 eager 与编译推理路径的对比基准
+
+对同一组随机帧分别用 eager、tf.function (compiled) 和 tf.function + XLA 推理，
+报告各自的吞吐 (frames/sec) 以及与 eager 预测的最大绝对误差。
+
+用法 (在项目根目录下):
+    python -m benchmarks.bench_compiled_inference --frames 3000 --batch-size 8
+"""
+import argparse
+import time
+
+import numpy as np
+
+from transnetv2 import TransNetV2
+
+MODES = {
+    "eager": {},
+    "compiled": {"compiled": True},
+    "xla": {"jit_compile": True},
+}
+
+
+def bench(model, frames, batch_size, repeats):
+    start = time.perf_counter()
+    model.warmup(batch_size)
+    warmup_time = time.perf_counter() - start
+
+    best, predictions = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictions = model.predict_frames(frames, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) / best, warmup_time, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", type=str, default=None,
+                        help="path to TransNet V2 weights, tries to infer the location if not specified")
+    parser.add_argument("--frames", type=int, default=3000, help="number of synthetic frames")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    frames = np.random.default_rng(0).integers(0, 256, (args.frames, 27, 48, 3), dtype=np.uint8)
+
+    results = []
+    for mode in args.modes:
+        model = TransNetV2(args.weights, batch_size=args.batch_size, **MODES[mode])
+        results.append((mode, *bench(model, frames, args.batch_size, args.repeats)))
+
+    baseline_fps, _, baseline = results[0][1:]
+    print(f"{'mode':>9} {'frames/sec':>12} {'speedup':>8} {'warm-up':>9} {'max |diff|':>11}")
+    for mode, fps, warmup_time, predictions in results:
+        diff = max(np.abs(a - b).max(initial=0) for a, b in zip(predictions, baseline))
+        print(f"{mode:>9} {fps:>12.1f} {fps / baseline_fps:>7.2f}x {warmup_time:>8.2f}s {diff:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
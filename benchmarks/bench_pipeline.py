@@ -0,0 +1,297 @@
+"""
+端到端基准: 合成视频 + 分阶段计时，结果写入 JSON 以便跨提交比较
+
+用 ffmpeg lavfi 信号源 (testsrc2、smptehdbars、gradients ...) 拼接出带已知硬切的合成视频，
+按给定的分辨率、帧率与时长各生成一个，缓存在 --videos-dir 中供之后的运行复用。
+然后分别计时:
+  - decode: predict_video_2 使用的 extract_frames 解码 (装有 ffmpeg-python 与 ffmpeg 命令时
+    另计 predict_video 的整体耗时，含推理)
+  - inference: predict_frames
+  - predictions_to_scenes
+  - export_<mode>: 经 ExportPool 导出全部场景
+  - keyframes: save_keyframes
+  - merge_export: core.merge.merge_export
+  - end_to_end: BatchEngine 处理全部视频
+没有 --weights 时使用 benchmarks.stub_model 的替身模型 (相邻帧差判断硬切)，
+不需要权重也能测量推理以外的全部开销；替身检测到的硬切与生成时的真值一并报告。
+
+用法 (在项目根目录下):
+    python -m benchmarks.bench_pipeline --output bench.json
+    python -m benchmarks.bench_pipeline --resolutions 640x360 1920x1080 --fps 25 30 --duration 60
+    python -m benchmarks.bench_pipeline --weights transnetv2-weights/ --baseline bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from core.cache import default_cache_dir
+from core.engine import BatchEngine
+from core.exporter import EXPORT_MODES, ExportPool, packet_times, run_ffmpeg
+from core.keyframes import first_frames, save_keyframes
+from core.merge import merge_export
+from core.planner import get_plan
+from benchmarks.stub_model import stub_model
+
+# consecutive shots come from different sources, so every cut is a hard one
+SOURCES = [
+    "testsrc2=size={size}:rate={fps}",
+    "smptehdbars=size={size}:rate={fps}",
+    "gradients=size={size}:rate={fps}:speed=0.05:seed={seed}",
+    "rgbtestsrc=size={size}:rate={fps}",
+    "colorchart=rate={fps},scale={size}",
+    "color=c=0x{color:06x}:size={size}:rate={fps}",
+]
+SYNTHETIC_VERSION = 2
+
+
+def shot_lengths(rng, frames, fps, mean_seconds):
+    lengths = []
+    while sum(lengths) < frames:
+        lengths.append(max(fps // 2, int(rng.exponential(mean_seconds) * fps)))
+    lengths[-1] -= sum(lengths) - frames
+    if lengths[-1] < fps // 2 and len(lengths) > 1:
+        # no sliver of a shot at the end (popped first: `lengths[-2] += lengths.pop()` indexes before the pop)
+        last = lengths.pop()
+        lengths[-1] += last
+    return lengths
+
+
+def make_video(path, size, fps, seconds, mean_shot, seed):
+    """生成合成视频，返回硬切处 (新镜头第一帧) 的帧序号"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * fps)
+    lengths = shot_lengths(rng, frames, fps, mean_shot)
+    cuts = np.cumsum(lengths)[:-1].tolist()
+    cuts_path = path + ".json"
+    if os.path.exists(path) and os.path.exists(cuts_path):
+        with open(cuts_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        # videos of an older generator may have the wrong length
+        if info.get("version") == SYNTHETIC_VERSION:
+            return info["cuts"]
+
+    args, filters = [], []
+    for i, length in enumerate(lengths):
+        source = SOURCES[i % len(SOURCES)].format(size=size, fps=fps, seed=int(rng.integers(1 << 16)),
+                                                  color=int(rng.integers(1 << 24)))
+        args += ["-f", "lavfi", "-i", source]
+        filters.append(f"[{i}:v]trim=end_frame={length},setpts=PTS-STARTPTS,format=yuv420p,setsar=1[v{i}]")
+    filters.append("".join(f"[v{i}]" for i in range(len(lengths))) + f"concat=n={len(lengths)}:v=1:a=0[out]")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".part.mp4"
+    run_ffmpeg(args + ["-filter_complex", ";".join(filters), "-map", "[out]", "-frames:v", str(frames),
+                       "-c:v", "libx264", "-preset", "veryfast", "-g", str(fps * 2), "-r", str(fps), tmp_path])
+    # the ground truth and the frame-based throughput numbers assume exactly seconds * fps frames
+    written = len(packet_times(tmp_path, os.path.dirname(path)))
+    if written != frames:
+        os.remove(tmp_path)
+        raise RuntimeError(f"synthetic video {path} has {written} frames, expected {frames}")
+    os.replace(tmp_path, path)
+    with open(cuts_path, "w", encoding="utf-8") as f:
+        json.dump({"version": SYNTHETIC_VERSION, "size": size, "fps": fps, "seconds": seconds,
+                   "seed": seed, "cuts": cuts}, f)
+    return cuts
+
+
+def best_of(repeats, fn):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def cut_recall(cuts, scenes, tolerance=2):
+    detected = np.array([int(start) for start, _ in scenes[1:]])
+    found = sum(1 for c in cuts if len(detected) and np.abs(detected - c).min() <= tolerance)
+    return found / len(cuts) if cuts else 1.0
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def add(stages, name, seconds, **counts):
+    stage = stages.setdefault(name, {"seconds": 0.0})
+    stage["seconds"] += seconds
+    for key, value in counts.items():
+        stage[key] = stage.get(key, 0) + value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", nargs="+", default=["640x360", "1280x720"])
+    parser.add_argument("--fps", nargs="+", type=int, default=[25])
+    parser.add_argument("--duration", type=float, default=30, help="seconds per synthetic video")
+    parser.add_argument("--shot-seconds", type=float, default=3, help="mean shot length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--videos-dir", default=None, help="where synthetic videos are kept between runs")
+    parser.add_argument("--weights", default=None, help="real TransNet V2 weights (default: stub model)")
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="seconds the stub model spends per window")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--export-modes", nargs="+", choices=EXPORT_MODES, default=["copy", "reencode"])
+    parser.add_argument("--repeats", type=int, default=3, help="runs of decode / inference, best is kept")
+    parser.add_argument("--no-end-to-end", action="store_true")
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    videos_dir = args.videos_dir or os.path.join(default_cache_dir(), "bench-videos")
+    if args.weights:
+        from transnetv2 import TransNetV2
+        model = TransNetV2(args.weights, batch_size=args.batch_size)
+    else:
+        model = stub_model(args.batch_size, args.stub_delay)
+    model.warmup()
+
+    videos = []
+    for size in args.resolutions:
+        for fps in args.fps:
+            name = f"synthetic_{size}_{fps}fps_{args.duration:g}s_seed{args.seed}"
+            path = os.path.join(videos_dir, name + ".mp4")
+            print(f"preparing {name}")
+            cuts = make_video(path, size, fps, args.duration, args.shot_seconds, args.seed)
+            videos.append({"name": name, "path": path, "size": size, "fps": fps, "cuts": cuts})
+
+    try:
+        import ffmpeg  # noqa: F401
+        has_ffmpeg_python = shutil.which("ffmpeg") is not None
+    except ImportError:
+        has_ffmpeg_python = False
+    plan = get_plan({"planner_calibration": False})
+    stages = {}
+    work = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        output_root = os.path.join(work, "output")
+        for video in videos:
+            print(f"timing {video['name']}")
+            path = video["path"]
+            seconds, frames = best_of(args.repeats, lambda: model.extract_frames(path))
+            add(stages, "decode", seconds, frames=len(frames), bytes=os.path.getsize(path))
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds, (single, all_) = best_of(args.repeats, lambda: model.predict_frames(frames))
+            add(stages, "inference", seconds, frames=len(frames))
+            if has_ffmpeg_python:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, _ = best_of(args.repeats, lambda: model.predict_video(path))
+                add(stages, "predict_video", seconds, frames=len(frames))
+            seconds, scenes = best_of(args.repeats * 10,
+                                      lambda: model.predictions_to_scenes(single, args.threshold))
+            add(stages, "predictions_to_scenes", seconds, frames=len(frames))
+            video.update(frames=len(frames), scenes=len(scenes), cut_recall=cut_recall(video["cuts"], scenes))
+
+            fps = video["fps"]
+            jobs = [(f"{video['name']}_scene_{i + 1:03d}", s / fps, e / fps) for i, (s, e) in enumerate(scenes)]
+            for mode in args.export_modes:
+                out_dir = os.path.join(work, mode, video["name"])
+                os.makedirs(out_dir)
+                pool = ExportPool(plan.export_workers, plan.encoder_threads)
+                start = time.perf_counter()
+                exporter = pool.exporter(path, mode, fps)
+                scene_jobs = [(os.path.join(out_dir, name + ".mp4"), st, et) for name, st, et in jobs]
+                if exporter.single_pass:
+                    futures = [pool.submit(None, exporter.export_all, scene_jobs)]
+                else:
+                    futures = [pool.submit(None, exporter.export, *job) for job in scene_jobs]
+                for _, error in pool.results(futures):
+                    if error is not None:
+                        raise error
+                seconds = time.perf_counter() - start
+                pool.shutdown()
+                add(stages, f"export_{mode}", seconds, scenes=len(scenes),
+                    bytes=sum(os.path.getsize(p) for p, _, _ in scene_jobs))
+                if mode == args.export_modes[0]:
+                    # the merge input: scene files of the first mode plus their keyframes
+                    shutil.copytree(out_dir, os.path.join(output_root, video["name"]))
+
+            kf_dir = os.path.join(output_root, video["name"], "keyframes")
+            os.makedirs(kf_dir)
+            start = time.perf_counter()
+            save_keyframes(path, first_frames(scenes), [os.path.join(kf_dir, name + ".jpg") for name, _, _ in jobs])
+            add(stages, "keyframes", time.perf_counter() - start, scenes=len(scenes))
+
+        start = time.perf_counter()
+        _, copied, _ = merge_export(output_root)
+        add(stages, "merge_export", time.perf_counter() - start, scenes=copied)
+
+        if not args.no_end_to_end:
+            print("timing end_to_end")
+            engine = BatchEngine({
+                "files": [video["path"] for video in videos],
+                "output_dir": os.path.join(work, "engine"),
+                "batch_size": args.batch_size,
+                "threshold": args.threshold,
+                "export_mode": args.export_modes[0],
+                "prediction_cache": False,
+                "use_daemon": False,
+            })
+            engine.model = model
+            start = time.perf_counter()
+            engine.run()
+            add(stages, "end_to_end", time.perf_counter() - start, videos=len(videos),
+                frames=sum(video["frames"] for video in videos))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    for stage in stages.values():
+        for key in ("frames", "scenes", "bytes"):
+            if key in stage and stage["seconds"] > 0:
+                stage[f"{key}_per_sec"] = stage[key] / stage["seconds"]
+
+    commit, dirty = git_commit()
+    result = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count(), "usable_cpus": plan.cpus},
+        "model": "weights" if args.weights else "stub",
+        "settings": vars(args),
+        "videos": [{k: v for k, v in video.items() if k != "path"} for video in videos],
+        "stages": stages,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"baseline: {baseline.get('commit')} ({baseline.get('created')})")
+    print(f"{'stage':>24} {'seconds':>9} {'rate':>18}" + (f" {'vs baseline':>12}" if baseline else ""))
+    for name, stage in stages.items():
+        rate = next((f"{stage[k]:.1f} {k[:-8]}/s" for k in ("frames_per_sec", "scenes_per_sec") if k in stage), "")
+        line = f"{name:>24} {stage['seconds']:>9.3f} {rate:>18}"
+        old = baseline["stages"].get(name) if baseline else None
+        if old and stage["seconds"] > 0:
+            line += f" {old['seconds'] / stage['seconds']:>11.2f}x"
+        print(line)
+    for video in videos:
+        print(f"{video['name']}: {video['frames']} frames, {len(video['cuts'])} cuts, "
+              f"{video['scenes']} scenes, cut recall {video['cut_recall']:.2f}")
+    print(f"results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
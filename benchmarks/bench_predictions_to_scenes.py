@@ -0,0 +1,97 @@
+"""
+predictions_to_scenes 向量化实现的等价性检查与基准
+
+先在边界用例 (空输入、全 1、全 0、首尾为转场、单帧等) 和随机预测上，把 `predictions_to_scenes`
+与 `predictions_to_scenes_sweep` 的每一行分别与原始逐帧循环 `_predictions_to_scenes_loop` 的输出比较，
+任何不一致都会报错退出；然后比较长视频上多阈值扫描的耗时。
+
+用法 (在项目根目录下):
+    python -m benchmarks.bench_predictions_to_scenes --frames 500000 --thresholds 20
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from transnetv2 import TransNetV2
+
+
+def edge_cases():
+    yield np.zeros(0, np.float32)
+    yield np.zeros(1, np.float32)
+    yield np.ones(1, np.float32)
+    yield np.ones(10, np.float32)
+    yield np.zeros(10, np.float32)
+    yield np.array([1, 1, 0, 0, 1, 0, 0, 1, 1], np.float32)
+    yield np.array([0, 1, 0, 1, 0, 1], np.float32)
+    yield np.array([1, 0, 1, 0, 1, 0], np.float32)
+    # values exactly at the threshold are not transitions
+    yield np.array([0.5, 0.5, 0.6, 0.5, 0.4], np.float32)
+
+
+def random_predictions(rng, n):
+    # sparse peaks on a noisy floor, with some multi-frame transitions
+    predictions = rng.random(n).astype(np.float32) * 0.3
+    peaks = rng.random(n) < 0.02
+    predictions[peaks] = rng.random(peaks.sum()) * 0.7 + 0.3
+    predictions[1:][peaks[:-1] & (rng.random(n - 1) < 0.5)] = 0.8
+    return predictions
+
+
+def check_equivalence(thresholds, rng, cases=200):
+    checked = 0
+    inputs = list(edge_cases()) + [random_predictions(rng, int(rng.integers(1, 2000))) for _ in range(cases)]
+    for predictions in inputs:
+        # plain floats, as the engine and the CLI pass the threshold
+        expected = [TransNetV2._predictions_to_scenes_loop(predictions, float(t)) for t in thresholds]
+        single = [TransNetV2.predictions_to_scenes(predictions, float(t)) for t in thresholds]
+        swept = TransNetV2.predictions_to_scenes_sweep(predictions, thresholds)
+        if len(swept) != len(thresholds):
+            print(f"MISMATCH sweep returned {len(swept)} scene lists for {len(thresholds)} thresholds", file=sys.stderr)
+            sys.exit(1)
+        for t, e, b, a in zip(thresholds, expected, single, swept):
+            for name, scenes in (("predictions_to_scenes", b), ("sweep row", a)):
+                if not (np.array_equal(e, scenes) and scenes.dtype == e.dtype):
+                    print(f"MISMATCH {name} threshold={t} predictions={predictions.tolist()}\n"
+                          f"loop={e.tolist()}\nvectorized={scenes.tolist()}", file=sys.stderr)
+                    sys.exit(1)
+            checked += 1
+    return checked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=500000, help="length of the synthetic prediction vector")
+    parser.add_argument("--thresholds", type=int, default=20, help="number of thresholds in the sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    thresholds = np.linspace(0.05, 0.95, args.thresholds)
+    checked = check_equivalence(np.concatenate([thresholds, [0.5]]), rng)
+    print(f"equivalence: {checked} scene lists identical to the loop implementation")
+
+    predictions = random_predictions(rng, args.frames)
+    start = time.perf_counter()
+    for t in thresholds:
+        TransNetV2._predictions_to_scenes_loop(predictions, t)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for t in thresholds:
+        TransNetV2.predictions_to_scenes(predictions, t)
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    TransNetV2.predictions_to_scenes_sweep(predictions, thresholds)
+    sweep_time = time.perf_counter() - start
+
+    print(f"{args.frames} frames x {args.thresholds} thresholds")
+    print(f"  loop:       {loop_time * 1000:9.1f} ms")
+    print(f"  vectorized: {single_time * 1000:9.1f} ms  ({loop_time / single_time:.1f}x)")
+    print(f"  sweep:      {sweep_time * 1000:9.1f} ms  ({loop_time / sweep_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
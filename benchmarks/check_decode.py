@@ -0,0 +1,93 @@
+"""
+解码结果与原实现的容差检查
+
+`TransNetV2.extract_frames` 用 ffmpeg 的 lanczos 直接缩放到 48x27，原实现是 MoviePy 全尺寸解码后
+逐帧用 PIL LANCZOS 缩放。两者的帧数与帧对齐相同，但像素值不完全相同 (1080p 素材上最大差约 20，
+约 10% 的像素不同)。本脚本对比两条路径:
+
+- 帧数必须相同
+- 像素平均绝对差与单帧平均差不超过容差 (单帧差过大说明帧错位)
+- 给出 --weights 时另外比较两组帧的预测值与在阈值下划分出的场景
+
+用法 (在项目根目录下):
+    python -m benchmarks.check_decode video.mp4 --frames 500 [--weights transnetv2-weights/]
+"""
+import argparse
+import math
+import sys
+
+import numpy as np
+
+# 48x27 像素的平均绝对差上限；单帧平均差超过 FRAME_TOLERANCE 视为帧错位
+MEAN_TOLERANCE = 1.0
+FRAME_TOLERANCE = 3.0
+
+
+def baseline_frames(video_path, limit=None):
+    """原实现的解码路径: MoviePy Resize (PIL LANCZOS) + 逐帧 get_frame；返回 (帧, 总帧数)"""
+    from moviepy import VideoFileClip
+    import moviepy.video.fx as vfx
+
+    with VideoFileClip(video_path, audio=False) as clip:
+        clip = clip.with_effects([vfx.Resize(new_size=(48, 27))])
+        duration = math.floor(clip.duration * 10) / 10
+        fps = clip.fps
+        no_frames = int(duration * fps)
+        count = no_frames if limit is None else min(limit, no_frames)
+        frames = np.array([clip.get_frame(t / fps) for t in range(count)], dtype=np.uint8)
+    return frames, no_frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("--frames", type=int, default=500,
+                        help="compare the first N frames (the baseline path is slow), 0: the whole video")
+    parser.add_argument("--weights", type=str, default=None,
+                        help="also compare predictions and scenes of both frame arrays with this model")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    from transnetv2 import TransNetV2
+    from benchmarks.stub_model import stub_model
+
+    base, base_total = baseline_frames(args.video, args.frames or None)
+    # decoding does not need the weights
+    model = TransNetV2(args.weights) if args.weights else stub_model()
+    frames = model.extract_frames(args.video)
+
+    failures = []
+    if len(frames) != base_total:
+        failures.append(f"帧数不同: {len(frames)} != {base_total}")
+    frames = frames[:len(base)]
+    diff = np.abs(frames.astype(np.int16) - base.astype(np.int16))
+    per_frame = diff.mean(axis=(1, 2, 3))
+    print(f"对比 {len(base)} 帧: 像素最大差 {diff.max()}，平均差 {diff.mean():.3f}，"
+          f"不同像素占 {(diff > 0).mean() * 100:.1f}%，单帧平均差最大 {per_frame.max():.3f} (第 {per_frame.argmax()} 帧)")
+    if diff.mean() > MEAN_TOLERANCE:
+        failures.append(f"平均差 {diff.mean():.3f} 超过容差 {MEAN_TOLERANCE}")
+    if per_frame.max() > FRAME_TOLERANCE:
+        failures.append(f"第 {per_frame.argmax()} 帧平均差 {per_frame.max():.3f} 超过 {FRAME_TOLERANCE}，帧可能错位")
+
+    if args.weights:
+        pred_base = model.predict_frames(base)[0]
+        pred = model.predict_frames(frames)[0]
+        pdiff = np.abs(pred - pred_base)
+        near = np.abs(pred_base - args.threshold) < 0.1
+        print(f"预测值最大差 {pdiff.max():.4f}，平均差 {pdiff.mean():.5f}；"
+              f"阈值 ±0.1 内的帧 {near.sum()} 个")
+        scenes_base = TransNetV2.predictions_to_scenes(pred_base, args.threshold)
+        scenes = TransNetV2.predictions_to_scenes(pred, args.threshold)
+        if not np.array_equal(scenes, scenes_base):
+            # reported, not a failure: frames near the threshold may flip
+            print(f"阈值 {args.threshold} 下场景不同: {len(scenes)} 个 / 原实现 {len(scenes_base)} 个")
+        else:
+            print(f"阈值 {args.threshold} 下场景相同 ({len(scenes)} 个)")
+
+    for failure in failures:
+        print("FAIL", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+共享任务表的多节点模拟
+
+在一个临时目录上启动若干"节点"进程，每个节点按各自的顺序领取同一批虚构视频，
+"处理"一段随机时间后标记完成，并把完成记录追加到日志文件。部分节点在处理中途
+直接退出 (os._exit，不释放租约)，模拟崩溃或断网。最后检查:
+  - 每个视频恰好完成一次
+  - 崩溃节点持有的视频在租约过期后被其他节点重新领取
+  - 任何时刻没有两个节点同时处理同一个视频
+
+另外两个单独的场景:
+  - 每个领取它的节点都崩溃的视频，MAX_ATTEMPTS 次后标记为失败，而不是一直显示为处理中
+  - 节点暂停 (SIGSTOP，模拟 NAS 写入卡住) 超过租约后视频被其他节点领取，恢复后的节点从续约结果
+    得知租约丢失并停止处理，不再标记完成
+
+用法 (在项目根目录下):
+    python -m benchmarks.simulate_jobqueue --nodes 6 --videos 40 --crash 2
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from core.jobqueue import MAX_ATTEMPTS, JobQueue
+
+
+def log(path, *fields):
+    # one short append per line, atomic for O_APPEND writes
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(" ".join(str(field) for field in fields) + "\n")
+
+
+def node(node_id, root, videos, lease, work, crash_after, seed):
+    rng = random.Random(seed)
+    order = list(videos)
+    rng.shuffle(order)
+    queue = JobQueue(root, node_id=node_id, lease=lease)
+    events = os.path.join(root, "events.log")
+    done = 0
+    # keep passing over the library until every video is done, picking up expired claims
+    while queue.counts().get("done", 0) < len(videos):
+        for video in order:
+            if not queue.claim(video):
+                continue
+            log(events, "start", video, node_id, time.time())
+            if crash_after is not None and done >= crash_after:
+                # die holding the claim: the heartbeat stops and the lease runs out
+                time.sleep(work * rng.random())
+                log(events, "crash", video, node_id, time.time())
+                os._exit(1)
+            time.sleep(work * rng.random())
+            log(events, "end", video, node_id, time.time())
+            queue.complete(video)
+            done += 1
+        time.sleep(lease / 4)
+    queue.close()
+
+
+def check(root, videos, crash_count):
+    starts, ends, crashed = {}, {}, {}
+    intervals = {}
+    with open(os.path.join(root, "events.log"), encoding="utf-8") as f:
+        for line in f:
+            kind, video, node_id, at = line.split()
+            at = float(at)
+            if kind == "start":
+                starts.setdefault(video, []).append((node_id, at))
+                intervals[(video, node_id, at)] = None
+            else:
+                if kind == "end":
+                    ends.setdefault(video, []).append(node_id)
+                else:
+                    crashed[video] = node_id
+                key = max(k for k in intervals if k[0] == video and k[1] == node_id)
+                intervals[key] = at
+
+    errors = []
+    for video in videos:
+        if len(ends.get(video, [])) != 1:
+            errors.append(f"{video}: completed {len(ends.get(video, []))} times")
+    for video, node_id in crashed.items():
+        if not any(n != node_id for n, _ in starts.get(video, [])):
+            errors.append(f"{video}: never reclaimed after {node_id} crashed")
+    # no run (finished or crashed) may overlap another node's run of the same video
+    for video in videos:
+        runs = sorted((start, end) for (v, _, start), end in intervals.items() if v == video and end is not None)
+        for (_, end), (start, _) in zip(runs, runs[1:]):
+            if start < end:
+                errors.append(f"{video}: two nodes worked on it at the same time")
+    if len(crashed) != crash_count:
+        errors.append(f"expected {crash_count} crashes, saw {len(crashed)}")
+    return errors, len(crashed)
+
+
+def crash_holding(root, video, lease):
+    queue = JobQueue(root, lease=lease)
+    if queue.claim(video):
+        os._exit(1)
+    os._exit(2)
+
+
+def poison_case(lease):
+    """每次都让领取它的节点崩溃的视频最终是 failed，没有 owner，并记录了原因"""
+    errors = []
+    with tempfile.TemporaryDirectory() as root:
+        JobQueue(root).close()
+        for attempt in range(MAX_ATTEMPTS):
+            proc = multiprocessing.Process(target=crash_holding, args=(root, "poison", lease))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 1:
+                errors.append(f"poison: crash {attempt + 1} could not claim the video")
+            time.sleep(lease * 1.2)
+        queue = JobQueue(root, lease=lease)
+        if queue.claim("poison"):
+            errors.append(f"poison: claimed again after {MAX_ATTEMPTS} expired leases")
+        (video, state, owner, _, attempts, _, error), = queue.jobs()
+        queue.close()
+    if state != "failed" or owner is not None or not error:
+        errors.append(f"poison: left as state={state} owner={owner} error={error!r}")
+    return errors
+
+
+def stalled_node(root, lease, events):
+    lost = threading.Event()
+    queue = JobQueue(root, node_id="stalled", lease=lease, on_lost=lambda video: lost.set())
+    queue.claim("stalled")
+    log(events, "start")
+    # "work" until done or told that the lease is gone
+    deadline = time.time() + lease * 8
+    while time.time() < deadline and not lost.is_set():
+        time.sleep(lease / 20)
+    if lost.is_set():
+        log(events, "lost")
+    else:
+        log(events, "end")
+        queue.complete("stalled")
+    queue.close()
+
+
+def stalled_case(lease):
+    """暂停超过租约的节点恢复后从续约结果得知租约丢失，不再完成已被接管的视频"""
+    if not hasattr(signal, "SIGSTOP"):
+        return []
+    errors = []
+    with tempfile.TemporaryDirectory() as root:
+        JobQueue(root).close()
+        events = os.path.join(root, "stalled.log")
+        proc = multiprocessing.Process(target=stalled_node, args=(root, lease, events))
+        proc.start()
+        while not os.path.exists(events):
+            time.sleep(0.01)
+        os.kill(proc.pid, signal.SIGSTOP)
+        time.sleep(lease * 1.5)
+        queue = JobQueue(root, node_id="rescuer", lease=lease)
+        if not queue.claim("stalled"):
+            errors.append("stalled: the expired lease was not taken over")
+        os.kill(proc.pid, signal.SIGCONT)
+        proc.join()
+        with open(events, encoding="utf-8") as f:
+            outcome = f.read().split()
+        queue.complete("stalled")
+        (_, state, _, _, _, _, _), = queue.jobs()
+        queue.close()
+    if outcome != ["start", "lost"]:
+        errors.append(f"stalled: the paused node logged {outcome}, expected it to notice the lost lease")
+    if state != "done":
+        errors.append(f"stalled: state {state} after the rescuer completed it")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=6)
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--crash", type=int, default=2, help="nodes that die while holding a video")
+    parser.add_argument("--lease", type=float, default=1.0, help="lease seconds (short, to make expiry visible)")
+    parser.add_argument("--work", type=float, default=0.2, help="maximum seconds of fake work per video")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    videos = [f"video_{i:03d}" for i in range(args.videos)]
+    with tempfile.TemporaryDirectory() as root:
+        JobQueue(root).close()  # create the table before the nodes race for it
+        start = time.perf_counter()
+        procs = []
+        for i in range(args.nodes):
+            crash_after = 1 + i if i < args.crash else None
+            proc = multiprocessing.Process(target=node, args=(f"node-{i}", root, videos, args.lease, args.work,
+                                                              crash_after, args.seed + i))
+            proc.start()
+            procs.append(proc)
+        for proc in procs:
+            proc.join()
+        seconds = time.perf_counter() - start
+
+        errors, crashes = check(root, videos, args.crash)
+        queue = JobQueue(root)
+        counts = queue.counts()
+        queue.close()
+    print(f"{args.nodes} nodes, {args.videos} videos, {crashes} crashes, {seconds:.1f}s; jobs {counts}")
+    for error in errors:
+        print("FAIL", error)
+    if not errors:
+        print("OK: every video completed exactly once, crashed claims were taken over")
+
+    case_errors = poison_case(args.lease)
+    case_errors += stalled_case(args.lease)
+    for error in case_errors:
+        print("FAIL", error)
+    if not case_errors:
+        print(f"OK: a video whose lease expired {MAX_ATTEMPTS} times is failed, a stalled node notices its lost lease")
+    return 1 if errors or case_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
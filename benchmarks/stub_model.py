@@ -0,0 +1,48 @@
+"""
+不需要权重的 TransNetV2 替身，用于在没有模型的机器上跑流水线基准
+
+StubBackend 以后端的形式接入 (core.backends.BACKENDS)，TransNetV2 的窗口切分、批处理、
+场景划分与引擎的各个阶段都照常运行，只有模型调用被替换为相邻帧的像素差:
+某帧与下一帧差异很大时把该帧判为转场 (硬切前的最后一帧)，对合成视频中的硬切足够准确。
+delay 可为每个窗口加上固定耗时，模拟真实模型的推理开销。
+
+    from benchmarks.stub_model import stub_model
+    model = stub_model(batch_size=8)
+    frames, single, all_ = model.predict_video_2("a.mp4")
+"""
+import time
+
+import numpy as np
+
+from core.backends import BACKENDS, InferenceBackend
+
+STUB_WEIGHTS = "stub"
+
+
+class StubBackend(InferenceBackend):
+    name = "stub"
+
+    def __init__(self, model_dir=STUB_WEIGHTS, delay=0.0, **options):
+        super().__init__(model_dir)
+        self.delay = delay
+
+    def predict_raw(self, frames):
+        frames = np.asarray(frames, dtype=np.float32)
+        # mean absolute difference of each frame to the next one, 0-1
+        diff = np.abs(frames[:, 1:] - frames[:, :-1]).mean(axis=(2, 3, 4)) / 255.
+        single = np.zeros(frames.shape[:2], np.float32)
+        single[:, :-1] = 1 / (1 + np.exp(-(diff - 0.1) * 60))
+        if self.delay:
+            time.sleep(self.delay * len(frames))
+        return single[..., None], single[..., None].copy()
+
+
+def register():
+    """把 stub 后端加入 BACKENDS，之后 backend="stub" 在本进程内可用 (包括 BatchEngine)"""
+    BACKENDS.setdefault(StubBackend.name, StubBackend)
+
+
+def stub_model(batch_size=8, delay=0.0):
+    from transnetv2 import TransNetV2
+    register()
+    return TransNetV2(STUB_WEIGHTS, batch_size=batch_size, backend=StubBackend.name, delay=delay)
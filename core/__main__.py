@@ -0,0 +1,155 @@
+"""
+无界面批处理命令行
+
+用法 (在项目根目录下):
+    python -m core videos/ -o output --jobs 4 --export-mode smart --output-format jsonl
+
+输入可以是视频文件或目录 (处理目录下的 .mp4)，默认输出到第一个输入所在目录的 output/ 下，
+与图形界面一致。--output-format jsonl 时每个事件在 stdout 上输出一行 JSON，
+形如 {"event": "video_progress", "video": "a", "percent": 50}。
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+from core.pool import ProcessPoolEngine
+from core.exporter import EXPORT_MODES, DEFAULT_EXPORT_MODE
+from core.keyframes import KEYFRAME_MODES, DEFAULT_KEYFRAME_MODE
+
+
+def collect_videos(inputs):
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith('.mp4'))
+        else:
+            files.append(path)
+    return files
+
+
+# events arrive from several pipeline threads, each line is written whole
+_stdout = sys.stdout
+_print_lock = threading.Lock()
+
+
+def write_line(line):
+    with _print_lock:
+        _stdout.write(line + "\n")
+        _stdout.flush()
+
+
+def text_printer(event, data):
+    if event == "log":
+        write_line(data["message"])
+    elif event == "progress":
+        write_line(f"[{data['current']}/{data['total']}]")
+
+
+def jsonl_printer(event, data):
+    write_line(json.dumps(dict(event=event, **data), ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m core", description="TransNetV2 场景分割批处理")
+    parser.add_argument("inputs", nargs="+", help="video files or directories containing .mp4 files")
+    parser.add_argument("-o", "--output", default=None,
+                        help="output root directory (default: <first input dir>/output)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of ffmpeg export jobs running at once (default: planned from cores and memory)")
+    parser.add_argument("--encoder-threads", type=int, default=None,
+                        help="threads per ffmpeg export job (default: calibrated on first run)")
+    parser.add_argument("--export-mode", choices=EXPORT_MODES, default=DEFAULT_EXPORT_MODE)
+    parser.add_argument("--output-format", choices=("text", "jsonl"), default="text",
+                        help="jsonl prints one machine-readable event per line on stdout")
+    parser.add_argument("--weights", default=None, help="path to TransNet V2 weights")
+    parser.add_argument("--batch-size", type=int, default=8, help="number of 100-frame windows per model call")
+    parser.add_argument("--backend", default=None, choices=["savedmodel", "tflite-int8"],
+                        help="inference backend (default: savedmodel; tflite-int8 is a quantized CPU model)")
+    parser.add_argument("--tf-threads", type=int, default=None,
+                        help="TensorFlow intra-op threads (default: planned from the CPU count)")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes, each with its own model (default: one per 8 cores, capped by memory)")
+    parser.add_argument("--cpu-affinity", action="store_true",
+                        help="pin inference and ffmpeg encoders to separate cores (Linux)")
+    parser.add_argument("--compiled", action="store_true",
+                        help="run inference through a tf.function with a fixed input signature")
+    parser.add_argument("--xla", action="store_true", help="also compile the inference graph with XLA")
+    parser.add_argument("--job-queue", action="store_true",
+                        help="claim videos through a job table in the output folder, for several machines sharing it")
+    parser.add_argument("--metrics-dir", default=None,
+                        help="where transvideo-metrics.jsonl and transvideo.prom are written (default: output dir)")
+    parser.add_argument("--no-metrics", action="store_true", help="do not write per-stage timing metrics")
+    parser.add_argument("--frame-store", nargs="?", const="", default=None, metavar="DIR",
+                        help="decode into memory-mapped frame files in DIR (default: <cache dir>/frames) instead of RAM, "
+                             "reused by later runs")
+    parser.add_argument("--threshold", type=float, default=0.5, help="scene transition threshold")
+    parser.add_argument("--no-keyframes", action="store_true", help="do not extract keyframe images")
+    parser.add_argument("--keyframe-mode", choices=KEYFRAME_MODES, default=DEFAULT_KEYFRAME_MODE)
+    parser.add_argument("--recut", action="store_true",
+                        help="re-cut already processed videos with --threshold, re-exporting only changed scenes")
+    parser.add_argument("--cache-dir", default=None, help="prediction cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the prediction cache")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="always load the model in this process, even if the inference daemon is running")
+    args = parser.parse_args()
+
+    if args.output_format == "jsonl":
+        # keep stdout for events only, stray prints from the model or libraries go to stderr
+        sys.stdout = sys.stderr
+
+    files = collect_videos(args.inputs)
+    if not files:
+        parser.error("no video files found")
+    output_dir = args.output
+    if output_dir is None:
+        first = args.inputs[0]
+        output_dir = os.path.join(first if os.path.isdir(first) else os.path.dirname(os.path.abspath(first)), "output")
+
+    engine = ProcessPoolEngine({
+        'files': files,
+        'output_dir': output_dir,
+        'extract_keyframes': not args.no_keyframes,
+        'keyframe_mode': args.keyframe_mode,
+        'weights': args.weights,
+        'batch_size': args.batch_size,
+        'threshold': args.threshold,
+        'recut': args.recut,
+        'export_mode': args.export_mode,
+        'export_workers': args.jobs,
+        'encoder_threads': args.encoder_threads,
+        'tf_intra_threads': args.tf_threads,
+        'cpu_affinity': args.cpu_affinity,
+        'worker_processes': args.processes,
+        'prediction_cache': not args.no_cache,
+        'cache_dir': args.cache_dir,
+        'use_daemon': not args.no_daemon,
+        'backend': args.backend,
+        'compiled_inference': args.compiled,
+        'xla': args.xla,
+        'job_queue': args.job_queue,
+        'metrics': not args.no_metrics,
+        'metrics_dir': args.metrics_dir,
+        'frame_store': args.frame_store is not None,
+        'frame_store_dir': args.frame_store or None,
+    }, jsonl_printer if args.output_format == "jsonl" else text_printer)
+
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        engine.stop()
+        engine.emit("log", message="任务已中断")
+        return 130
+    except Exception as e:
+        if args.output_format == "jsonl":
+            jsonl_printer("error", {"message": str(e)})
+        else:
+            print(f"发生错误: {e}", file=sys.stderr)
+        return 1
+    engine.emit("finished")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
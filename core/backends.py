@@ -0,0 +1,204 @@
+"""
+TransNetV2 推理后端
+
+后端只负责一件事: predict_raw(frames) 把 [B, frames, 27, 48, 3] 的帧送入模型，
+返回经过 sigmoid 的 (single_frame_pred, all_frames_pred)，形状均为 [B, frames, 1]。
+窗口切分、批处理与场景划分仍由 TransNetV2 完成。
+
+- savedmodel: 原始 TF SavedModel (float32)，可选 tf.function / XLA 编译
+- tflite-int8: 由 SavedModel 转换并做动态范围量化 (int8 权重) 的 TFLite 模型，
+  转换结果按权重标识缓存，CPU 上更快、更省内存
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INPUT_SIZE = (27, 48, 3)
+DEFAULT_BACKEND = "savedmodel"
+
+
+def load_saved_model(model_dir):
+    # TensorFlow is only imported when a model is loaded in this process
+    import tensorflow as tf
+    try:
+        return tf.saved_model.load(model_dir)
+    except OSError as exc:
+        raise IOError(f"[TransNetV2] It seems that files in {model_dir} are corrupted or missing. "
+                      f"Re-download them manually and retry. For more info, see: "
+                      f"https://github.com/soCzech/TransNetV2/issues/1#issuecomment-647357796") from exc
+
+
+def _forward(model):
+    import tensorflow as tf
+
+    def forward(frames):
+        logits, dict_ = model(tf.cast(frames, tf.float32))
+        return tf.sigmoid(logits), tf.sigmoid(dict_["many_hot"])
+
+    return forward
+
+
+class InferenceBackend(ABC):
+    name = None
+
+    def __init__(self, model_dir, **options):
+        self.model_dir = model_dir
+
+    @abstractmethod
+    def predict_raw(self, frames):
+        """[B, frames, 27, 48, 3] -> (single_frame_pred, all_frames_pred)，形状均为 [B, frames, 1]"""
+
+
+class SavedModelBackend(InferenceBackend):
+    """
+    compiled: 推理走 tf.function，固定输入签名的图，uint8 转换与两个 sigmoid 都在图内，
+    省去逐个 eager op 的调度开销；jit_compile 另外用 XLA 编译该图 (隐含 compiled)。
+    较小的批 (视频末尾的不满批) 用全零窗口补齐到已编译的批大小再截取结果，不会为每种长度重新追踪 / 编译；
+    batch_size 为默认编译的批大小。
+    """
+    name = "savedmodel"
+
+    def __init__(self, model_dir, compiled=False, jit_compile=False, batch_size=1, **options):
+        super().__init__(model_dir)
+        self.compiled = bool(compiled or jit_compile)
+        self.jit_compile = bool(jit_compile)
+        self.batch_size = max(1, int(batch_size))
+        self.model = load_saved_model(model_dir)
+        self._functions = {}
+
+    def _compiled_function(self, batch_size):
+        function = self._functions.get(batch_size)
+        if function is None:
+            import tensorflow as tf
+            # a fixed shape per batch size: one trace each, and XLA can specialise on it
+            function = self._functions[batch_size] = tf.function(
+                _forward(self.model),
+                input_signature=[tf.TensorSpec((batch_size, 100) + INPUT_SIZE, tf.uint8)],
+                jit_compile=self.jit_compile or None)
+        return function
+
+    def _predict_compiled(self, frames):
+        n = len(frames)
+        fitting = [size for size in self._functions if size >= n]
+        size = min(fitting) if fitting else max(n, self.batch_size)
+        if size > n:
+            frames = np.concatenate([frames, np.zeros((size - n,) + frames.shape[1:], dtype=np.uint8)])
+        single_frame_pred, all_frames_pred = self._compiled_function(size)(frames)
+        return single_frame_pred[:n], all_frames_pred[:n]
+
+    def predict_raw(self, frames):
+        import tensorflow as tf
+        if self.compiled and frames.shape[1] == 100 and frames.dtype == np.uint8:
+            return self._predict_compiled(frames)
+        frames = tf.cast(frames, tf.float32)
+
+        logits, dict_ = self.model(frames)
+        single_frame_pred = tf.sigmoid(logits)
+        all_frames_pred = tf.sigmoid(dict_["many_hot"])
+
+        return single_frame_pred, all_frames_pred
+
+
+class TFLiteInt8Backend(InferenceBackend):
+    """
+    SavedModel 经 TFLiteConverter 转换，Optimize.DEFAULT 做动态范围量化: 权重存为 int8，
+    激活在运行时按需量化。转换只在第一次使用某份权重时进行，结果与一份记录
+    (源权重标识、TensorFlow 版本、耗时、大小) 一起存入 cache_dir/models。
+    """
+    name = "tflite-int8"
+
+    def __init__(self, model_dir, cache_dir=None, num_threads=None, **options):
+        super().__init__(model_dir)
+        self.model_path = self.convert(model_dir, cache_dir)
+        try:
+            # tf.lite.Interpreter is deprecated in favour of the standalone LiteRT package
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=num_threads)
+        self._runner = self.interpreter.get_signature_runner()
+        # a TFLite interpreter must not be used from several threads at once
+        self._lock = threading.Lock()
+
+    @classmethod
+    def cached_path(cls, model_dir, cache_dir=None):
+        from core.cache import default_cache_dir, weights_fingerprint
+        cache_dir = os.path.join(cache_dir or default_cache_dir(), "models")
+        return os.path.join(cache_dir, f"{weights_fingerprint(model_dir)}-{cls.name}.tflite")
+
+    @classmethod
+    def convert(cls, model_dir, cache_dir=None):
+        """返回缓存中的转换结果，没有时转换并写入缓存"""
+        path = cls.cached_path(model_dir, cache_dir)
+        if os.path.exists(path):
+            return path
+
+        import tensorflow as tf
+        logger.info(f"正在把 {model_dir} 转换为 {cls.name} 模型...")
+        start = time.perf_counter()
+        model = load_saved_model(model_dir)
+        forward = _forward(model)
+
+        def serve(frames):
+            single_frame_pred, all_frames_pred = forward(frames)
+            return {"single": single_frame_pred, "all": all_frames_pred}
+
+        # dynamic batch dimension, the signature runner resizes the input per call
+        function = tf.function(serve, input_signature=[tf.TensorSpec((None, 100) + INPUT_SIZE, tf.uint8)])
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([function.get_concrete_function()], model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        data = converter.convert()
+        seconds = time.perf_counter() - start
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tflite", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        record = {
+            "backend": cls.name,
+            "source": os.path.abspath(model_dir),
+            "weights_id": os.path.basename(path).split("-")[0],
+            "tensorflow": tf.__version__,
+            "seconds": round(seconds, 2),
+            "bytes": len(data),
+        }
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        logger.info(f"{cls.name} 转换完成，耗时 {seconds:.1f}s，{len(data) / 1e6:.1f} MB: {path}")
+        return path
+
+    def predict_raw(self, frames):
+        frames = np.asarray(frames)
+        if frames.dtype != np.uint8:
+            # the converted graph takes uint8 frames, like the windows TransNetV2 builds
+            frames = np.clip(np.rint(frames), 0, 255).astype(np.uint8)
+        with self._lock:
+            # the signature runner resizes the input and reallocates when the batch shape changes
+            outputs = self._runner(frames=frames)
+            return outputs["single"].copy(), outputs["all"].copy()
+
+
+BACKENDS = {backend.name: backend for backend in (SavedModelBackend, TFLiteInt8Backend)}
+
+
+def create_backend(name, model_dir, **options):
+    """按名称创建后端，options 传给后端构造函数，不认识的选项被忽略"""
+    backend = BACKENDS.get(name or DEFAULT_BACKEND)
+    if backend is None:
+        raise ValueError(f"unknown inference backend {name!r}, choose from {', '.join(BACKENDS)}")
+    return backend(model_dir, **options)
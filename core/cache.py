@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+# 采样哈希: 读取文件头、尾以及中间均匀分布的若干块，大文件也只需读几 MB
+SAMPLE_SIZE = 1 << 20
+SAMPLE_COUNT = 8
+
+CACHE_VERSION = 1
+
+
+def default_cache_dir():
+    """TRANSVIDEO_CACHE_DIR 优先，否则使用系统的用户缓存目录"""
+    cache_dir = os.environ.get("TRANSVIDEO_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "TransVideo", "cache")
+    return os.path.join(os.path.expanduser("~"), ".cache", "transvideo")
+
+
+def sampled_hash(path, size=None):
+    """文件大小 + 若干采样块的 blake2b 摘要，不依赖文件名和修改时间"""
+    if size is None:
+        size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        if size <= SAMPLE_SIZE * SAMPLE_COUNT:
+            h.update(f.read())
+        else:
+            step = (size - SAMPLE_SIZE) // (SAMPLE_COUNT - 1)
+            for i in range(SAMPLE_COUNT):
+                f.seek(i * step)
+                h.update(f.read(SAMPLE_SIZE))
+    return h.hexdigest()
+
+
+# (绝对路径, 大小, mtime) -> 采样哈希，预测缓存与帧存储共用
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def video_fingerprint(video_path):
+    """视频内容指纹 (sampled_hash)；size + mtime 只用于进程内记忆化，避免同一文件反复读取"""
+    st = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), st.st_size, st.st_mtime_ns)
+    with _fingerprints_lock:
+        fp = _fingerprints.get(memo_key)
+    if fp is None:
+        fp = sampled_hash(video_path, st.st_size)
+        with _fingerprints_lock:
+            _fingerprints[memo_key] = fp
+    return fp
+
+
+def weights_fingerprint(model_dir):
+    """模型权重的标识: SavedModel 图与变量索引文件的采样哈希"""
+    h = hashlib.blake2b(digest_size=16)
+    for name in ("saved_model.pb", os.path.join("variables", "variables.index")):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            h.update(sampled_hash(path).encode())
+    return h.hexdigest()
+
+
+def prediction_model_id(model_dir, backend=None, decoder="extract_frames"):
+    """
+    预测缓存使用的模型标识: 权重标识，savedmodel 以外的后端另加后端名称，再加解码帧的方式
+
+    decoder: 解码帧的 TransNetV2 方法，"extract_frames" (处理引擎、--frame-store) 或 "predict_video"
+    (命令行默认，ffmpeg-python 缩放)。两者的像素不同，预测值也略有不同。
+    """
+    model_id = weights_fingerprint(model_dir)
+    if backend and backend != "savedmodel":
+        # quantized backends predict slightly different values, keep their entries apart
+        model_id = f"{model_id}-{backend}"
+    # likewise for the two decoders: a CLI run must not hand its predictions to the engine or the other way round
+    return f"{model_id}:{decoder}"
+
+
+class PredictionCache:
+    """
+    按视频内容缓存 TransNetV2 的 single_frame_predictions / all_frame_predictions
+
+    键为 (文件大小 + 采样哈希) 与模型标识 (`prediction_model_id`)，因此复制到其他目录的同一视频也能命中。
+    指纹由 `video_fingerprint` 计算，与帧存储共用进程内的记忆化结果。
+    每个视频一个 .npz 文件，写入先落临时文件再原子替换。
+    """
+
+    def __init__(self, cache_dir=None, model_id=""):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.model_id = model_id
+
+    def fingerprint(self, video_path):
+        return video_fingerprint(video_path)
+
+    def _entry_path(self, video_path):
+        key = hashlib.blake2b(f"{CACHE_VERSION}:{self.model_id}:{self.fingerprint(video_path)}".encode(),
+                              digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".npz")
+
+    def get(self, video_path):
+        """命中时返回 (single_frame_predictions, all_frame_predictions)，否则返回 None"""
+        try:
+            path = self._entry_path(video_path)
+            if not os.path.exists(path):
+                return None
+            with np.load(path) as data:
+                return data["single"], data["all"]
+        except (OSError, ValueError, KeyError):
+            # unreadable or truncated entries are treated as misses and rewritten later
+            return None
+
+    def put(self, video_path, single_frame_predictions, all_frame_predictions):
+        path = self._entry_path(video_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f,
+                                    single=np.asarray(single_frame_predictions, dtype=np.float32),
+                                    all=np.asarray(all_frame_predictions, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -12,6 +12,36 @@ class ConfigManager:
             "last_folder": "",
             "extract_keyframes": True,
             "skip_existing": True,
+            "batch_size": 8,
+            "weights": None,  # None: transnetv2-weights/ in the working directory
+            "preload_model": True,  # load and warm up the model in the background at startup
+            "backend": "savedmodel",  # inference backend: savedmodel or tflite-int8 (quantized, CPU)
+            "compiled_inference": False,  # tf.function with a fixed input signature per batch size
+            "xla": False,  # also compile the inference graph with XLA (implies compiled_inference)
+            "use_daemon": True,  # use the local inference daemon (python -m core.daemon) when it is running
+            "export_mode": "reencode",
+            # None: sized by core.planner from the CPU count, available memory and a short calibration
+            "export_workers": None,
+            "encoder_threads": None,
+            "decode_workers": None,
+            "export_videos": None,  # videos exporting at the same time
+            "pipeline_queue_size": None,
+            "tf_intra_threads": None,
+            "tf_inter_threads": None,
+            "cpu_affinity": False,  # pin inference and ffmpeg encoders to separate cores (Linux)
+            "planner_calibration": True,
+            "worker_processes": None,  # processes with their own model replica; None: one per 8 cores, capped by memory
+            "job_queue": False,  # coordinate several machines sharing one output folder (core.jobqueue)
+            "job_lease": 120,  # seconds a claimed video stays reserved without a heartbeat
+            "metrics": True,  # per-stage timings: transvideo-metrics.jsonl and transvideo.prom (Prometheus textfile)
+            "metrics_dir": None,  # None: the output folder
+            "frame_store": False,  # decode into memory-mapped .npy files instead of RAM (long videos)
+            "frame_store_dir": None,  # None: <cache_dir>/frames
+            "frame_store_max_gb": 20,  # least recently used frame files are deleted above this size
+            "threshold": 0.5,
+            "keyframe_mode": "first",  # first / representative
+            "prediction_cache": True,
+            "cache_dir": None,  # None: $TRANSVIDEO_CACHE_DIR or the user cache dir
             "window_geometry": None
         }
         self.data = self.load_config()
@@ -0,0 +1,397 @@
+"""
+本机 TransNetV2 推理守护进程
+
+常驻一个已预热的模型，客户端 (图形界面、python -m core) 通过 Unix socket 发送请求，
+帧窗口与预测结果经共享内存传递，不经过 socket 拷贝。多个客户端的窗口会被合并进同一批推理。
+
+共享内存由守护进程为每个连接分配 (0o600)，创建后立即 unlink，文件描述符经 SCM_RIGHTS 交给该连接的
+客户端: 其他用户连接同一 socket 只能使用自己的缓冲区，无法按名称打开别人的帧或预测结果。
+
+启动:
+    python -m core.daemon --weights transnetv2-weights/ --batch-size 16
+
+守护进程未运行 (或系统不支持 Unix socket) 时，客户端自动在本进程内加载模型。
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import queue
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SHAPE = (100, 27, 48, 3)
+WINDOW_BYTES = int(np.prod(WINDOW_SHAPE))
+# single_frame_pred 与 all_frames_pred，每个窗口各 100 个 float32
+RESULT_BYTES = 2 * 100 * 4
+# 单个连接的共享内存上限 (约 100 MB)，更多窗口由客户端分次发送
+MAX_WINDOWS = 256
+
+_HEADER = struct.Struct("!I")
+# other users on the same workstation share this daemon; each connection only reaches its own segment
+SOCKET_MODE = 0o666
+
+
+class DaemonError(Exception):
+    pass
+
+
+def default_socket_path():
+    return os.environ.get("TRANSVIDEO_DAEMON_SOCKET") or os.path.join(tempfile.gettempdir(), "transvideo-daemon.sock")
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def recv_message(sock):
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    if data is None:
+        raise ConnectionError("connection closed mid-message")
+    return json.loads(data.decode("utf-8"))
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _segment_size(windows):
+    return windows * (WINDOW_BYTES + RESULT_BYTES)
+
+
+def _buffers(buf, windows):
+    frames = np.ndarray((windows,) + WINDOW_SHAPE, dtype=np.uint8, buffer=buf)
+    results = np.ndarray((2, windows, 100, 1), dtype=np.float32, buffer=buf, offset=windows * WINDOW_BYTES)
+    return frames, results
+
+
+class _Segment:
+    """守护进程为一个连接分配的共享内存"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = _segment_size(capacity)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.size)
+        # no name left to open: only this process and the client that receives the descriptor can map it
+        self.shm.unlink()
+
+    @property
+    def fd(self):
+        return self.shm._fd
+
+    def close(self):
+        self.shm.close()
+
+
+class _Request:
+    def __init__(self, frames, results):
+        self.frames = frames
+        self.results = results
+        self.error = None
+        self.done = threading.Event()
+
+
+class InferenceDaemon:
+    """
+    每个客户端连接一个线程，请求放入队列；单个推理线程把多个请求的窗口拼成一批，
+    批大小达到 batch_size 或等待超过 batch_wait 秒后送入模型，再把结果写回各请求的共享内存。
+    """
+
+    def __init__(self, model, socket_path=None, batch_size=8, batch_wait=0.005):
+        from core.cache import weights_fingerprint
+        self.model = model
+        self.socket_path = socket_path or default_socket_path()
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+        self.weights = os.path.abspath(model._model_dir)
+        self.weights_id = weights_fingerprint(model._model_dir)
+        self._requests = queue.Queue()
+        self._server = None
+        self._stopped = threading.Event()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            # a stale socket from a crashed daemon; a live one answers the ping
+            if ping(self.socket_path) is not None:
+                raise DaemonError(f"daemon already running on {self.socket_path}")
+            os.remove(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        os.chmod(self.socket_path, SOCKET_MODE)
+        self._server.listen()
+        threading.Thread(target=self._batch_loop, name="daemon-batcher", daemon=True).start()
+        logger.info(f"TransNetV2 推理守护进程已启动: {self.socket_path}")
+        try:
+            while not self._stopped.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._serve_client, args=(conn,), name="daemon-client", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _serve_client(self, conn):
+        # the segment allocated for this connection
+        segments = {}
+        try:
+            while True:
+                try:
+                    message = recv_message(conn)
+                except ValueError as e:
+                    # not JSON; the length prefix was read, so the next message is still framed correctly
+                    send_message(conn, {"ok": False, "error": f"malformed message: {e}"})
+                    continue
+                if message is None:
+                    break
+                try:
+                    reply = self._handle(message, segments)
+                except (OSError, TypeError, ValueError, KeyError, AttributeError, struct.error) as e:
+                    # a malformed request or a failed allocation: answer it, keep the connection
+                    logger.warning(f"客户端请求无效: {type(e).__name__}: {e}")
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                send_message(conn, reply)
+                if reply.get("ok") and message.get("op") == "alloc":
+                    # the segment has no name; its descriptor follows the reply as one byte with SCM_RIGHTS
+                    socket.send_fds(conn, [b"\0"], [segments["segment"].fd])
+        except (OSError, ValueError) as e:
+            logger.warning(f"客户端连接异常: {e}")
+        finally:
+            conn.close()
+            segment = segments.pop("segment", None)
+            if segment is not None:
+                segment.close()
+
+    def _handle(self, message, segments):
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True, "weights": self.weights, "weights_id": self.weights_id,
+                    "backend": self.model.backend, "batch_size": self.batch_size}
+        if op == "alloc":
+            capacity = int(message["windows"])
+            if not 0 < capacity <= MAX_WINDOWS:
+                raise ValueError(f"windows must be between 1 and {MAX_WINDOWS}, got {capacity}")
+            segment = segments.pop("segment", None)
+            if segment is not None:
+                segment.close()
+            segment = segments["segment"] = _Segment(capacity)
+            return {"ok": True, "capacity": segment.capacity, "size": segment.size}
+        if op == "predict":
+            segment = segments.get("segment")
+            if segment is None:
+                raise ValueError("no shared memory allocated for this connection")
+            capacity, windows = int(message["capacity"]), int(message["windows"])
+            # the layout depends on the capacity; a different one would read frames from the wrong offsets
+            if capacity != segment.capacity:
+                raise ValueError(f"capacity {capacity} does not match the allocated {segment.capacity} windows")
+            if not 0 < windows <= capacity:
+                raise ValueError(f"windows must be between 1 and {capacity}, got {windows}")
+            frames, results = _buffers(segment.shm.buf, capacity)
+            request = _Request(frames[:windows], results[:, :windows])
+            self._requests.put(request)
+            request.done.wait()
+            if request.error is not None:
+                return {"ok": False, "error": str(request.error)}
+            return {"ok": True}
+        if op == "release":
+            segment = segments.pop("segment", None)
+            if segment is not None:
+                segment.close()
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            windows = len(batch[0].frames)
+            deadline = time.monotonic() + self.batch_wait
+            # give other clients a moment to add their windows to this batch
+            while windows < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                windows += len(request.frames)
+            try:
+                single, all_ = self.model.predict_batch(np.concatenate([r.frames for r in batch]))
+                offset = 0
+                for request in batch:
+                    n = len(request.frames)
+                    request.results[0] = single[offset:offset + n]
+                    request.results[1] = all_[offset:offset + n]
+                    offset += n
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            for request in batch:
+                request.done.set()
+            # drop the views before waiting for the next request, or a released segment could not be closed
+            batch = request = None
+
+
+def ping(socket_path=None, timeout=1.0):
+    """守护进程在运行时返回其 ping 应答，否则返回 None"""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = socket_path or default_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            send_message(sock, {"op": "ping"})
+            return recv_message(sock)
+    except (OSError, ValueError):
+        return None
+
+
+class DaemonClient:
+    """
+    守护进程客户端，predict(windows) 与 TransNetV2.predict_batch 的输入输出相同
+
+    每个客户端复用守护进程分配的一块共享内存，窗口数超过其容量时重新分配；
+    超过 MAX_WINDOWS 的窗口分次发送。
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket_path()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(self.socket_path)
+        self._lock = threading.Lock()
+        self._buf = None
+        self._capacity = 0
+        self.info = self._call({"op": "ping"})
+
+    def _call(self, message):
+        send_message(self._sock, message)
+        reply = recv_message(self._sock)
+        if reply is None:
+            raise ConnectionError("inference daemon closed the connection")
+        if not reply.get("ok"):
+            raise DaemonError(reply.get("error", "unknown daemon error"))
+        return reply
+
+    def _ensure_capacity(self, windows):
+        if windows <= self._capacity:
+            return
+        self._unmap()
+        # the daemon replaces the previous segment of this connection
+        reply = self._call({"op": "alloc", "windows": windows})
+        _, fds, _, _ = socket.recv_fds(self._sock, 1, 1)
+        if not fds:
+            raise DaemonError("inference daemon did not send the shared memory descriptor")
+        try:
+            self._buf = mmap.mmap(fds[0], reply["size"])
+        finally:
+            for fd in fds:
+                os.close(fd)
+        self._capacity = reply["capacity"]
+
+    def _unmap(self):
+        if self._buf is not None:
+            self._buf.close()
+            self._buf = None
+            self._capacity = 0
+
+    def predict(self, windows):
+        windows = np.asarray(windows, dtype=np.uint8)
+        if len(windows) > MAX_WINDOWS:
+            parts = [self.predict(windows[i:i + MAX_WINDOWS]) for i in range(0, len(windows), MAX_WINDOWS)]
+            return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+        n = len(windows)
+        with self._lock:
+            self._ensure_capacity(n)
+            # layout depends on the capacity, not on n, so the daemon sees the region the client wrote
+            frames, results = _buffers(self._buf, self._capacity)
+            try:
+                frames[:n] = windows
+                self._call({"op": "predict", "capacity": self._capacity, "windows": n})
+                return results[0, :n].copy(), results[1, :n].copy()
+            finally:
+                # a traceback keeps this frame's locals; without views the mapping can still be closed
+                del frames, results
+
+    def close(self):
+        with self._lock:
+            try:
+                self._sock.close()
+            finally:
+                self._unmap()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m core.daemon", description="TransNetV2 本机推理守护进程")
+    parser.add_argument("--socket", default=None,
+                        help="socket path (default: $TRANSVIDEO_DAEMON_SOCKET or <tmp>/transvideo-daemon.sock)")
+    parser.add_argument("--weights", default=None, help="path to TransNet V2 weights")
+    parser.add_argument("--batch-size", type=int, default=8, help="max windows per model call across clients")
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0,
+                        help="how long to wait for other clients' windows before running a batch")
+    parser.add_argument("--backend", default=None, choices=["savedmodel", "tflite-int8"],
+                        help="inference backend (default: savedmodel; tflite-int8 is a quantized CPU model)")
+    parser.add_argument("--compiled", action="store_true",
+                        help="run inference through a tf.function with a fixed input signature")
+    parser.add_argument("--xla", action="store_true", help="also compile the inference graph with XLA")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not hasattr(socket, "AF_UNIX"):
+        print("Unix sockets are not supported on this platform", file=sys.stderr)
+        return 1
+
+    from core.model import load_model
+    model = load_model(args.weights, use_daemon=False, batch_size=args.batch_size,
+                       backend=args.backend, compiled=args.compiled, jit_compile=args.xla)
+    daemon = InferenceDaemon(model, args.socket,
+                             batch_size=args.batch_size, batch_wait=args.batch_wait_ms / 1000.)
+    # plain `kill` should also remove the socket file
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        daemon.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
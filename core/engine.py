@@ -0,0 +1,666 @@
+import math
+import os
+import threading
+import time
+
+from core.model import load_model
+from core.exporter import ExportPool, ExportCancelled, DEFAULT_EXPORT_MODE, partial_path
+from core.pipeline import Pipeline, Stage
+from core.planner import get_plan
+from core.cache import PredictionCache, prediction_model_id
+from core.framestore import FrameStore
+from core.manifest import SceneManifest, source_fingerprint, diff_scenes
+from core.jobqueue import JobQueue, DEFAULT_LEASE
+from core.metrics import RunMetrics, VideoMetrics
+from core.keyframes import first_frames, representative_frames, save_keyframes, DEFAULT_KEYFRAME_MODE
+
+# frame-level progress of a stage is passed on when the percentage changes, or at least this often (seconds)
+PROGRESS_INTERVAL = 1.0
+
+
+class VideoTask:
+    """
+    State of one video as it moves through the decode -> inference -> export -> keyframes pipeline.
+    """
+    def __init__(self, idx, video_path, output_root):
+        self.idx = idx
+        self.video_path = video_path
+        self.video_name = os.path.splitext(os.path.basename(video_path))[0]
+        self.output_dir = os.path.join(output_root, self.video_name)
+        self.keyframes_dir = os.path.join(self.output_dir, "keyframes")
+        self.frames = None
+        self.single_frame_predictions = None
+        self.all_frame_predictions = None
+        self.scenes = None
+        self.keyframe_frames = None  # frame index of each scene's keyframe
+        self.manifest = None
+        self.fps = None
+        self.jobs = []  # (scene_idx, scene_name, scene_path, start_time, end_time)
+        self.metrics = VideoMetrics(self.video_name)
+        # progress reporting: current stage, when it started, last percentage sent and when
+        self.stage = None
+        self.stage_started = None
+        self.reported = (None, 0.0)
+        self.progress_lock = threading.Lock()
+
+class BatchEngine:
+    """
+    Qt-free scene detection and export engine.
+
+    Progress is reported through `callback(event, data)`, where `event` is one of
+    "log" {message}, "result" {type, video, scene_index, image_path, video_path},
+    "progress" {current, total}, "video_progress" {video, percent[, stage, done, total, eta]} (done / total
+    are frames while decoding and inferring, seconds of video while exporting; eta is the stage's remaining seconds),
+    "video_done" {video, skipped}, "video_skipped" {video} (claimed by another node of the
+    shared job queue) and "video_metrics" {video, cached, seconds, frames, windows, ...} (see core.metrics).
+    `run()` blocks until all videos are done and raises on errors.
+    """
+    def __init__(self, config, callback=None):
+        self.config = config
+        self.callback = callback
+        self.is_interrupted = False
+        self.model = None
+        self.export_pool = None
+        self.pipeline = None
+        self.cache = None
+        self.frame_store = None
+        self.prefiltered_at = None  # when the outputs were checked; done jobs finished before that are stale
+        self.lost_videos = set()  # claims of the shared job queue taken over by another node
+        self.metrics = None  # RunMetrics of run(); engines driven through process() only emit video_metrics
+
+    def emit(self, event, **data):
+        if event == "video_metrics" and self.metrics is not None:
+            try:
+                self.metrics.add(data)
+            except OSError as e:
+                self.metrics = None
+                self.emit("log", message=f"写入性能统计失败，本次不再记录: {e}")
+        if self.callback is not None:
+            self.callback(event, data)
+
+    def stop(self):
+        self.is_interrupted = True
+        # Stop feeding the pipeline, drop queued scene encodes and kill the running ffmpeg processes
+        pipeline, pool = self.pipeline, self.export_pool
+        if pipeline is not None:
+            pipeline.stop()
+        if pool is not None:
+            pool.cancel()
+
+    def run(self):
+        files = self.config.get('files', [])
+        
+        # Pre-filter files to see what actually needs processing
+        # This avoids loading the model if everything is already done
+        self.prefiltered_at = time.time()
+        to_process = self.prefilter(files)
+
+        if not to_process:
+            self.emit("log", message="所有文件均已存在结果，无需重复处理。")
+            return
+
+        if self.config.get('metrics', True):
+            try:
+                self.metrics = RunMetrics(self.config.get('metrics_dir') or self.config.get('output_dir'))
+            except OSError as e:
+                self.emit("log", message=f"无法创建性能统计文件，本次不记录: {e}")
+        try:
+            self.process(to_process, completed=len(files) - len(to_process), total=len(files))
+        finally:
+            self.report_metrics()
+        
+        if self.is_interrupted:
+            self.emit("log", message="任务已中断")
+        
+        self.emit("log", message="所有任务完成")
+
+    def report_metrics(self):
+        """Close the run's metrics and log the per-stage summary table"""
+        metrics = self.metrics
+        if metrics is None:
+            return
+        try:
+            metrics.finish()
+        except OSError as e:
+            self.emit("log", message=f"写入性能统计失败: {e}")
+        if metrics.videos:
+            for line in metrics.summary_lines():
+                self.emit("log", message=line)
+            self.emit("run_metrics", videos=metrics.videos, seconds=metrics.seconds, counters=metrics.counters,
+                      jsonl=metrics.jsonl_path, prometheus=metrics.prometheus_path)
+
+    def prefilter(self, files):
+        """
+        Report already finished videos (results, progress, video_done) and return the
+        [(idx, video_path), ...] that still need processing
+        """
+        output_root = self.config.get('output_dir')
+        extract_keyframes = self.config.get('extract_keyframes', True)
+        # Re-cut: reuse stored predictions with the current threshold and only re-export changed scenes
+        recut = self.config.get('recut', False)
+        total_files = len(files)
+        to_process = []
+        
+        for idx, video_path in enumerate(files):
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            video_output_dir = os.path.join(output_root, video_name)
+            keyframes_dir = os.path.join(video_output_dir, "keyframes")
+            
+            # A video is done when its manifest says every scene (and keyframe, if requested)
+            # was written and the source file is unchanged
+            manifest = SceneManifest.load(video_output_dir)
+            is_done = False
+            if manifest is not None:
+                is_done = (manifest.complete
+                           and (not extract_keyframes or manifest.data.get("keyframes", False))
+                           and source_fingerprint(video_path, manifest.source) == manifest.source)
+            elif os.path.exists(video_output_dir):
+                # Output of an older version without a manifest: any mp4 means done
+                scene_files = [f for f in os.listdir(video_output_dir) if f.endswith('.mp4')]
+                if len(scene_files) > 0:
+                    is_done = True
+            
+            if is_done and not recut:
+                self.emit("log", message=f"检测到已处理: {video_name}，跳过AI分析")
+                self.emit("progress", current=idx + 1, total=total_files)
+                
+                # Emit results for existing files so they show up in UI
+                if extract_keyframes and manifest is not None:
+                    for i in range(len(manifest.scenes)):
+                        self.emit("result",
+                            type="keyframe",
+                            video=video_name,
+                            scene_index=i + 1,
+                            image_path=manifest.keyframe_path(i),
+                            video_path=manifest.scene_path(i)
+                        )
+                elif extract_keyframes and os.path.exists(keyframes_dir):
+                    kf_files = sorted([f for f in os.listdir(keyframes_dir) if f.endswith('.jpg')])
+                    for kf in kf_files:
+                        scene_idx = kf.split('_')[-1].split('.')[0] # 1_scene_001.jpg -> 001
+                        try:
+                            scene_num = int(scene_idx)
+                            video_file = kf.replace('.jpg', '.mp4')
+                            self.emit("result",
+                                type="keyframe",
+                                video=video_name,
+                                scene_index=scene_num,
+                                image_path=os.path.join(keyframes_dir, kf),
+                                video_path=os.path.join(video_output_dir, video_file)
+                            )
+                        except: pass
+                
+                # Also notify list item to turn green
+                self.emit("video_done", video=video_name, skipped=True)
+                continue
+
+            to_process.append((idx, video_path))
+        return to_process
+
+    def process(self, to_process, completed=0, total=None):
+        """
+        Run the pipeline over [(idx, video_path), ...] (any iterable, consumed lazily);
+        `completed` / `total` are the counts reported by the "progress" events
+        """
+        output_root = self.config.get('output_dir')
+        self.extract_keyframes = self.config.get('extract_keyframes', True)
+
+        # threads and concurrency of every stage, sized together for this machine
+        plan = get_plan(self.config)
+        self.emit("log", message=plan.describe())
+
+        self.emit("log", message="正在加载AI模型 (TransNetV2)...")
+        # Only load model if we have work
+        # Usually already loaded and warmed up in the background after the window appeared
+        if self.model is None:
+            self.model = load_model(self.config.get('weights'), use_daemon=self.config.get('use_daemon', True),
+                                    batch_size=self.config.get('batch_size', 8),
+                                    backend=self.config.get('backend'),
+                                    compiled=self.config.get('compiled_inference', False),
+                                    jit_compile=self.config.get('xla', False),
+                                    cache_dir=self.config.get('cache_dir'), plan=plan)
+        if self.model._predictor is not None:
+            self.emit("log", message="使用本机推理守护进程进行推理")
+        if self.config.get('prediction_cache', True) and self.cache is None:
+            self.cache = PredictionCache(self.config.get('cache_dir'),
+                                         prediction_model_id(self.model._model_dir, self.model.backend))
+        if self.config.get('frame_store', False) and self.frame_store is None:
+            # decoded frames go to memory-mapped files instead of RAM, and are reused by later runs
+            store_dir = self.config.get('frame_store_dir')
+            if store_dir is None and self.config.get('cache_dir'):
+                store_dir = os.path.join(self.config.get('cache_dir'), "frames")
+            max_gb = self.config.get('frame_store_max_gb', 20)
+            self.frame_store = FrameStore(store_dir, max_bytes=int(max_gb * 1e9) if max_gb else None)
+        
+        # Staged pipeline: CPU-heavy export of one video overlaps with decode and inference
+        # of the next ones. Bounded queues between the stages cap how many decoded videos
+        # are held in memory at once.
+        self.export_pool = ExportPool(plan.export_workers, plan.encoder_threads, plan.export_cpus)
+        self.pipeline = Pipeline([
+            Stage("decode", self.stage_decode, workers=plan.decode_workers),
+            # Windows of several videos share inference batches so short clips still fill a batch
+            Stage("inference", self.stage_inference, workers=1,
+                  max_batch=self.config.get('pack_videos', 8),
+                  batch_weight=lambda task: len(task.frames) if task.frames is not None else 0,
+                  max_batch_weight=self.config.get('pack_max_frames', 30000)),
+            Stage("export", self.stage_export, workers=plan.export_videos),
+            Stage("keyframes", self.stage_keyframes, workers=self.config.get('keyframe_workers', 1)),
+        ], queue_size=plan.pipeline_queue_size)
+        if self.is_interrupted:
+            self.pipeline.stop()
+            self.export_pool.cancel()
+        
+        progress_lock = threading.Lock()
+        self.lost_videos = set()
+
+        def on_lost(video):
+            # Called from the heartbeat thread: the stages drop the video, the node that took it over redoes it
+            nonlocal completed
+            with progress_lock:
+                self.lost_videos.add(video)
+                completed += 1
+                current = completed
+            self.emit("log", message=f"{video} 的租约已失效 (可能已由其他节点接管)，停止处理")
+            self.emit("video_skipped", video=video)
+            self.emit("progress", current=current, total=total)
+
+        jobs = None
+        if self.config.get('job_queue', False):
+            # Several nodes share this output folder: claim each video before working on it
+            jobs = JobQueue(output_root, lease=self.config.get('job_lease', DEFAULT_LEASE), on_lost=on_lost)
+
+        def claimed_tasks():
+            # Consumed by the pipeline's feeder thread, so a video is claimed only when it is about to start
+            nonlocal completed
+            for idx, video_path in to_process:
+                task = VideoTask(idx, video_path, output_root)
+                if jobs is None or jobs.claim(task.video_name, video_path, since=self.prefiltered_at):
+                    yield task
+                    continue
+                self.emit("log", message=f"{task.video_name} 已由其他节点处理或正在处理，跳过")
+                with progress_lock:
+                    completed += 1
+                    current = completed
+                self.emit("video_skipped", video=task.video_name)
+                self.emit("progress", current=current, total=total)
+
+        try:
+            for task in self.pipeline.run(claimed_tasks()):
+                if self.lease_lost(task):
+                    # Lost after its last check; already counted as skipped
+                    continue
+                if jobs is not None:
+                    jobs.complete(task.video_name)
+                with progress_lock:
+                    completed += 1
+                    current = completed
+                self.emit("video_metrics", **task.metrics.to_dict())
+                self.emit("video_done", video=task.video_name, skipped=False)
+                # Emit progress AFTER completion, not before
+                self.emit("progress", current=current, total=total)
+        except KeyboardInterrupt:
+            # Ctrl+C lands here on the main thread: kill the encodes now, not after shutdown() waited for them
+            self.stop()
+            raise
+        except Exception as e:
+            if jobs is not None:
+                # The pipeline does not say which video failed: every unfinished claim counts an attempt
+                jobs.fail_held(e)
+            raise
+        finally:
+            self.export_pool.shutdown()
+            if jobs is not None:
+                # Claims left unfinished by a stop go back to the queue for other nodes
+                jobs.close()
+
+    def report_progress(self, task, pct, stage=None, done=None, total=None, eta=None):
+        """
+        Emit "video_progress". Frame-level updates carry the stage, done / total and the stage's ETA
+        (estimated from its rate so far unless given) and are throttled to PROGRESS_INTERVAL.
+        """
+        pct = int(pct)
+        if stage is None:
+            task.reported = (pct, time.monotonic())
+            self.emit("video_progress", video=task.video_name, percent=pct)
+            return
+        now = time.monotonic()
+        with task.progress_lock:
+            if stage != task.stage:
+                task.stage, task.stage_started = stage, now
+            elif pct == task.reported[0] and now - task.reported[1] < PROGRESS_INTERVAL:
+                return
+            task.reported = (pct, now)
+            if eta is None and done and total and done < total:
+                eta = (now - task.stage_started) * (total - done) / done
+        self.emit("video_progress", video=task.video_name, percent=pct, stage=stage,
+                  done=round(done, 1) if done is not None else None, total=round(total, 1) if total is not None else None,
+                  eta=round(eta, 1) if eta is not None else None)
+
+    def check_cancelled(self):
+        """Called from the progress callbacks: abort the running decode, inference batch or encode on stop"""
+        if self.is_interrupted:
+            raise ExportCancelled()
+
+    def lease_lost(self, task):
+        """The shared job queue gave the video to another node: every stage drops it, the encodes are killed"""
+        return task.video_name in self.lost_videos
+
+    def stage_decode(self, task):
+        if self.lease_lost(task):
+            return None
+        self.emit("log", message=f"开始处理: {task.video_name}")
+        cached = self.cache.get(task.video_path) if self.cache is not None else None
+        if cached is not None:
+            self.emit("log", message=f"使用缓存的分析结果: {task.video_name}")
+            task.single_frame_predictions, task.all_frame_predictions = cached
+            task.metrics.cached = True
+            # Representative keyframes still need the low-res frames
+            if self.config.get('keyframe_mode', DEFAULT_KEYFRAME_MODE) != "representative":
+                self.report_progress(task, 10)
+                return task
+        self.emit("log", message=f"正在解码视频帧: {task.video_name} ...")
+        self.report_progress(task, 0, "decode")
+
+        def on_decode(done, total):
+            self.check_cancelled()
+            if self.lease_lost(task):
+                raise ExportCancelled()
+            self.report_progress(task, 10 * done / max(1, total), "decode", done, total)
+
+        try:
+            with task.metrics.timer("decode"):
+                task.frames = self.model.extract_frames(os.path.normpath(task.video_path), progress=on_decode,
+                                                        frame_store=self.frame_store)
+            task.metrics.count("frames", len(task.frames))
+        except ExportCancelled:
+            return None
+        except Exception as e:
+            self.emit("log", message=f"处理视频 {task.video_name} 失败: {str(e)}")
+            raise e
+        self.report_progress(task, 10)
+        return task
+
+    def stage_inference(self, tasks):
+        tasks = [task for task in tasks if not self.lease_lost(task)]
+        # Videos with cached predictions skip the model
+        to_infer = [task for task in tasks if task.single_frame_predictions is None]
+        if to_infer:
+            self.emit("log", message=f"正在分析场景: {', '.join(task.video_name for task in to_infer)} ...")
+            start = time.perf_counter()
+            # Videos of a pack are inferred one after another: video i is done once the frames
+            # of videos 0..i are, which gives its ETA from the pack's rate
+            ends = [sum(len(task.frames) for task in to_infer[:i + 1]) for i in range(len(to_infer))]
+            for task in to_infer:
+                self.report_progress(task, 10, "inference", 0, len(task.frames))
+
+            def on_infer(i, done, total):
+                self.check_cancelled()
+                pack_done = (ends[i - 1] if i else 0) + done
+                eta = (time.perf_counter() - start) * (ends[i] - pack_done) / pack_done
+                self.report_progress(to_infer[i], 10 + 40 * done / max(1, total), "inference", done, total, eta)
+
+            try:
+                predictions = self.model.predict_many([task.frames for task in to_infer],
+                                                      batch_size=self.config.get('batch_size', 8), progress=on_infer)
+            except ExportCancelled:
+                return []
+            # Videos share the batches, the time is split by frame count
+            seconds = time.perf_counter() - start
+            frames = sum(len(task.frames) for task in to_infer)
+            for task in to_infer:
+                task.metrics.add_time("inference", seconds * len(task.frames) / max(1, frames))
+                task.metrics.count("windows", math.ceil(len(task.frames) / 50))
+            for task, (single_frame_predictions, all_frame_predictions) in zip(to_infer, predictions):
+                task.single_frame_predictions = single_frame_predictions
+                task.all_frame_predictions = all_frame_predictions
+                if self.cache is not None:
+                    try:
+                        self.cache.put(task.video_path, single_frame_predictions, all_frame_predictions)
+                    except OSError as e:
+                        self.emit("log", message=f"写入缓存失败 {task.video_name}: {e}")
+        
+        for task in tasks:
+            with task.metrics.timer("scenes"):
+                task.scenes = self.model.predictions_to_scenes(task.single_frame_predictions,
+                                                               threshold=self.config.get('threshold', 0.5))
+                # Keyframes are chosen while the low-res frames are still in memory
+                if self.config.get('keyframe_mode', DEFAULT_KEYFRAME_MODE) == "representative":
+                    task.keyframe_frames = representative_frames(task.frames, task.all_frame_predictions, task.scenes)
+                else:
+                    task.keyframe_frames = first_frames(task.scenes)
+            task.metrics.count("scenes", len(task.scenes))
+            # The low-res frames are not needed past inference
+            task.frames = None
+            self.report_progress(task, 50)
+            self.emit("log", message=f"场景分析完成: {task.video_name}，共识别出 {len(task.scenes)} 个场景")
+        return tasks
+
+    def stage_export(self, task):
+        if self.lease_lost(task):
+            return None
+        try:
+            with task.metrics.timer("export"):
+                self.export_scenes(task)
+        except Exception as e:
+            self.emit("log", message=f"处理视频 {task.video_name} 失败: {str(e)}")
+            raise e
+        # Another node now writes this output folder
+        return None if self.lease_lost(task) else task
+
+    def export_scenes(self, task):
+        video_name = task.video_name
+        # Create output structure
+        # Output/VideoName/
+        os.makedirs(task.output_dir, exist_ok=True)
+        
+        # The 'scenes' returned are frame indices of the low-res decode, which keeps the
+        # source frame rate, so they map 1:1 onto the ORIGINAL video at clip.fps.
+        from moviepy import VideoFileClip
+        with VideoFileClip(task.video_path, audio=False) as clip:
+            task.fps = clip.fps
+        fps = task.fps
+        total_scenes = len(task.scenes)
+        
+        task.jobs = []
+        for i, (start_frame, end_frame) in enumerate(task.scenes):
+            scene_idx = i + 1
+            scene_name = f"{video_name}_scene_{scene_idx:03d}"
+            scene_path = os.path.join(task.output_dir, f"{scene_name}.mp4")
+            task.jobs.append((scene_idx, scene_name, scene_path, start_frame / fps, end_frame / fps))
+        
+        # Carry over the completion state of scenes that are unchanged since the last run
+        old = SceneManifest.load(task.output_dir)
+        source = source_fingerprint(task.video_path, old.source if old is not None else None)
+        source_changed = old is not None and old.source is not None and old.source["hash"] != source["hash"]
+        if source_changed:
+            self.emit("log", message=f"源视频已变化，重新导出全部片段: {video_name}")
+            old = None
+        previous = [dict(scene) for scene in old.scenes] if old is not None else None
+        
+        if self.config.get('recut', False):
+            kept = self.apply_recut(task, old)
+        elif source_changed:
+            kept = {}
+        elif old is not None:
+            old_bounds = old.bounds()
+            kept = {i: i for i, (s, e) in enumerate(task.scenes)
+                    if i < len(old_bounds) and old_bounds[i] == (int(s), int(e))}
+        else:
+            # No manifest: scene files are only ever renamed into place once complete, so existing ones are done
+            kept = None
+        
+        manifest = SceneManifest(task.output_dir, {
+            "video": task.video_path,
+            "source": source,
+            "fps": fps,
+            "threshold": self.config.get('threshold', 0.5),
+            "keyframes": bool(self.extract_keyframes),
+            "scenes": [],
+        })
+        for i, (scene_idx, scene_name, scene_path, _, _) in enumerate(task.jobs):
+            kf_path = os.path.join(task.keyframes_dir, f"{scene_name}.jpg")
+            if kept is None:
+                exported, keyframe = os.path.exists(scene_path), os.path.exists(kf_path)
+            elif i in kept:
+                exported = previous[kept[i]]["exported"] and os.path.exists(scene_path)
+                keyframe = previous[kept[i]]["keyframe"] and os.path.exists(kf_path)
+            else:
+                exported, keyframe = False, False
+            start, end = task.scenes[i]
+            manifest.scenes.append({"start": int(start), "end": int(end), "name": scene_name,
+                                    "exported": exported, "keyframe": keyframe})
+        manifest.save()
+        task.manifest = manifest
+        
+        # Resume at the exact missing scenes
+        missing = []
+        for i, job in enumerate(task.jobs):
+            if manifest.scenes[i]["exported"]:
+                self.emit("log", message=f"跳过已存在: {os.path.basename(job[2])}")
+            else:
+                missing.append(job)
+        
+        # Progress in seconds of video: scenes already on disk, finished ones and the running encodes
+        total_seconds = sum(end - start for *_, start, end in task.jobs) or 1.0
+        durations = {partial_path(job[2]): job[4] - job[3] for job in missing}
+        missing_seconds = sum(durations.values())
+        span = max((job[4] for job in missing), default=0)  # single_pass encodes the source up to here
+        encoded = {}  # running ffmpeg output -> seconds of its scenes encoded so far
+        finished_seconds = [total_seconds - missing_seconds]
+        progress_lock = threading.Lock()
+
+        def on_encode(path, seconds):
+            if self.lease_lost(task):
+                # ends this ffmpeg; the scene's file is left to the node that took the video over
+                raise ExportCancelled()
+            with progress_lock:
+                if path in durations:
+                    encoded[path] = min(seconds, durations[path])
+                elif exporter.single_pass and span:
+                    encoded[path] = min(seconds, span) / span * missing_seconds
+                else:
+                    return
+                done = finished_seconds[0] + sum(encoded.values())
+            self.report_progress(task, 50 + 40 * done / total_seconds, "export", done, total_seconds)
+
+        # Encode the missing scenes on the shared pool of ffmpeg processes
+        pool = self.export_pool
+        try:
+            exporter = pool.exporter(task.video_path, self.config.get('export_mode', DEFAULT_EXPORT_MODE), fps,
+                                     progress=on_encode)
+            self.report_progress(task, 50 + 40 * finished_seconds[0] / total_seconds, "export",
+                                 finished_seconds[0], total_seconds)
+            futures = []
+            if exporter.single_pass and missing:
+                self.emit("log", message=f"单次编码导出 {len(missing)}/{total_scenes} 个片段 ...")
+                futures.append(pool.submit(missing, exporter.export_all, [(p, st, et) for _, _, p, st, et in missing]))
+            else:
+                for job in missing:
+                    futures.append(pool.submit([job], exporter.export, *job[2:]))
+            
+            # Scenes complete in any order
+            for finished_jobs, error in pool.results(futures):
+                if error is not None:
+                    if self.is_interrupted:
+                        continue
+                    raise error
+                manifest.mark([job[0] - 1 for job in finished_jobs], "exported")
+                task.metrics.count("scenes_exported", len(finished_jobs))
+                task.metrics.count("bytes_written", sum(os.path.getsize(job[2]) for job in finished_jobs
+                                                        if os.path.exists(job[2])))
+                for job in finished_jobs:
+                    self.emit("log", message=f"导出片段 {job[0]}/{total_scenes}: {os.path.basename(job[2])}")
+                with progress_lock:
+                    for job in finished_jobs:
+                        finished_seconds[0] += job[4] - job[3]
+                        encoded.pop(partial_path(job[2]), None)
+                    if exporter.single_pass:
+                        encoded.clear()
+                    done = finished_seconds[0] + sum(encoded.values())
+                # Update progress, 50% to 90% mapping
+                self.report_progress(task, 50 + 40 * done / total_seconds, "export", done, total_seconds)
+        except ExportCancelled:
+            pass
+
+    def apply_recut(self, task, old):
+        """
+        Diff the new scene list against the stored one: scenes with unchanged boundaries keep their
+        exported files (renamed to the new index), stale scene files and keyframes are deleted.
+        Returns {new index: old index} of the kept scenes.
+        """
+        def scene_files(idx):
+            scene_name = f"{task.video_name}_scene_{idx + 1:03d}"
+            return [os.path.join(task.output_dir, f"{scene_name}.mp4"),
+                    os.path.join(task.keyframes_dir, f"{scene_name}.jpg")]
+        
+        if old is not None:
+            kept, stale = diff_scenes(old.bounds(), task.scenes)
+            # Files are about to move: mark them pending first so a crash mid-rename only costs a re-export
+            moving = set(stale) | {j for i, j in kept.items() if i != j}
+            for j in moving:
+                old.scenes[j]["exported"] = old.scenes[j]["keyframe"] = False
+            old.save()
+        else:
+            # Output of an older run without a scene list: boundaries are unknown, rebuild everything
+            prefix = f"{task.video_name}_scene_"
+            old_names = os.listdir(task.output_dir)
+            kept, stale = {}, [int(name[len(prefix):-4]) - 1 for name in old_names
+                               if name.startswith(prefix) and name.endswith(".mp4") and name[len(prefix):-4].isdigit()]
+        
+        for old_idx in stale:
+            for path in scene_files(old_idx):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        # Two-phase rename so a scene moving to an index still held by another one never overwrites it
+        moved = [(new_idx, old_idx) for new_idx, old_idx in kept.items() if new_idx != old_idx]
+        for new_idx, old_idx in moved:
+            for path in scene_files(old_idx):
+                if os.path.exists(path):
+                    os.replace(path, os.path.join(os.path.dirname(path), f".recut_{old_idx}_" + os.path.basename(path)))
+        for new_idx, old_idx in moved:
+            for old_path, new_path in zip(scene_files(old_idx), scene_files(new_idx)):
+                tmp_path = os.path.join(os.path.dirname(old_path), f".recut_{old_idx}_" + os.path.basename(old_path))
+                if os.path.exists(tmp_path):
+                    os.replace(tmp_path, new_path)
+        
+        self.emit("log", message=f"重新切分 {task.video_name}: 保留 {len(kept)} 个片段，"
+                              f"删除 {len(stale)} 个，需导出 {len(task.scenes) - len(kept)} 个")
+        return kept
+
+    def stage_keyframes(self, task):
+        if self.is_interrupted or self.lease_lost(task):
+            return None
+        if self.extract_keyframes and task.jobs:
+            os.makedirs(task.keyframes_dir, exist_ok=True)
+            manifest = task.manifest
+            kf_paths = [manifest.keyframe_path(i) for i in range(len(task.jobs))]
+            missing = [i for i, scene in enumerate(manifest.scenes) if not scene["keyframe"]]
+            # All missing keyframes of the video come from one sequential decode
+            try:
+                with task.metrics.timer("keyframes"):
+                    written = set(save_keyframes(task.video_path, [task.keyframe_frames[i] for i in missing],
+                                                 [kf_paths[i] for i in missing], group=self.export_pool.group))
+                manifest.mark([i for i in missing if kf_paths[i] in written], "keyframe")
+                task.metrics.count("keyframes", len(written))
+                task.metrics.count("bytes_written", sum(os.path.getsize(path) for path in written))
+            except ExportCancelled:
+                return None
+            except Exception as e:
+                self.emit("log", message=f"关键帧提取失败 {task.video_name}: {e}")
+            
+            for (scene_idx, scene_name, scene_path, _, _), kf_path in zip(task.jobs, kf_paths):
+                if not manifest.scenes[scene_idx - 1]["keyframe"]:
+                    self.emit("log", message=f"关键帧提取失败 {scene_name}")
+                    continue
+                # Emit result for preview
+                self.emit("result",
+                    type="keyframe",
+                    video=task.video_name,
+                    scene_index=scene_idx,
+                    image_path=kf_path,
+                    video_path=scene_path
+                )
+        
+        self.report_progress(task, 100)
+        return task
@@ -0,0 +1,469 @@
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 场景导出模式:
+#   reencode - 逐场景 libx264/aac 完整重编码 (原有行为，最慢，兼容性最好)
+#   copy     - ffmpeg 流复制 (-c copy)，接近磁盘速度，但起点会落在之前最近的关键帧上
+#   smart    - 只重编码切点处不完整的 GOP 片段，其余视频流复制 (音频重编码)，帧精确且接近流复制速度
+#   single_pass - 整个视频只解码/编码一次，在场景边界强制关键帧并用 segment muxer 切出所有场景
+EXPORT_MODES = ("reencode", "copy", "smart", "single_pass")
+DEFAULT_EXPORT_MODE = "reencode"
+
+# 智能剪切需要把重编码的开头与流复制的部分直接拼接，只对 H.264 源可靠
+SMART_CUT_CODECS = ("h264",)
+
+_PTS_TIME_RE = re.compile(r"pts_time:\s*(-?[0-9.]+)")
+_VIDEO_STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: Video: (\w+)[^,]*, (\w+)")
+_PROFILE_RE = re.compile(r"Stream #\d+:\d+.*?: Video: \w+ \(([^)]+)\)")
+_TIMESCALE_RE = re.compile(r"Stream #\d+:\d+.*?: Video: .*?([0-9.]+)(k?) tbn")
+# H.264 profiles as printed by ffmpeg -> libx264 -profile:v
+_X264_PROFILES = {
+    "Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+    "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444",
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ProcessGroup:
+    """
+    跟踪一组正在运行的 ffmpeg 子进程，取消时可以一次性全部结束
+
+    cpus 不为空时，加入的进程被绑定到这些核心 (仅 Linux)。
+    """
+
+    def __init__(self, cpus=None):
+        self._lock = threading.Lock()
+        self._procs = set()
+        self.cancelled = False
+        self.cpus = cpus
+
+    def add(self, proc):
+        with self._lock:
+            if self.cancelled:
+                proc.kill()
+                raise ExportCancelled()
+            self._procs.add(proc)
+        if self.cpus:
+            try:
+                os.sched_setaffinity(proc.pid, self.cpus)
+            except OSError:
+                # the process may already have exited
+                pass
+
+    def discard(self, proc):
+        with self._lock:
+            self._procs.discard(proc)
+
+    def kill_all(self):
+        with self._lock:
+            self.cancelled = True
+            procs = list(self._procs)
+        for proc in procs:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+
+def partial_path(path):
+    """写入中的临时文件名，完成后再改名为 path；以 . 开头，扩展名不变以便 ffmpeg 识别格式"""
+    directory, name = os.path.split(path)
+    base, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{base}.part{ext}")
+
+
+def _read_progress(proc, progress):
+    # -progress writes key=value blocks; out_time_us is the output position in microseconds
+    for line in proc.stdout:
+        key, _, value = line.decode("ascii", "ignore").strip().partition("=")
+        if key == "out_time_us" and value.isdigit():
+            progress(int(value) / 1e6)
+
+
+def run_ffmpeg(args, group=None, progress=None):
+    """
+    运行 ffmpeg 命令，失败时抛出带 stderr 的 IOError，成功时返回 stderr 文本
+
+    progress(seconds): 编码过程中约每 0.5 秒以已输出的时长 (秒) 调用；在其中抛出异常会结束 ffmpeg。
+    """
+    # imported here so that loading this module does not pull in MoviePy
+    from moviepy.config import FFMPEG_BINARY
+    from moviepy.tools import cross_platform_popen_params
+
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-y"]
+    if progress is not None:
+        cmd += ["-progress", "pipe:1", "-nostats"]
+    cmd += list(args)
+    proc = subprocess.Popen(cmd, **cross_platform_popen_params({
+        "stdout": subprocess.PIPE if progress is not None else subprocess.DEVNULL,
+        "stderr": subprocess.PIPE,
+        "stdin": subprocess.DEVNULL,
+    }))
+    if group is not None:
+        group.add(proc)
+    try:
+        if progress is None:
+            _, err = proc.communicate()
+        else:
+            # stderr is drained on a thread so a chatty encode never blocks on a full pipe
+            chunks = []
+            reader = threading.Thread(target=lambda: chunks.append(proc.stderr.read()), daemon=True)
+            reader.start()
+            try:
+                _read_progress(proc, progress)
+            except BaseException:
+                proc.kill()
+                raise
+            finally:
+                proc.wait()
+                reader.join()
+                proc.stdout.close()
+                proc.stderr.close()
+            err = chunks[0] if chunks else b""
+    finally:
+        if group is not None:
+            group.discard(proc)
+    err = err.decode("utf-8", "ignore")
+    if group is not None and group.cancelled:
+        raise ExportCancelled()
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg failed ({proc.returncode}): {err.strip()[-500:]}")
+    return err
+
+
+def probe_video(video_path, group=None):
+    """
+    只解码关键帧，返回 {"codec", "pix_fmt", "profile", "timescale", "keyframes"}，
+    keyframes 为升序的关键帧时间 (秒)；profile (ffmpeg 显示的名称) 与 timescale (视频流时间基的分母)
+    无法识别时为 None
+    """
+    err = run_ffmpeg([
+        "-skip_frame", "nokey", "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn", "-vf", "showinfo", "-f", "null", "-",
+    ], group)
+    codec, pix_fmt, profile, timescale = None, None, None, None
+    match = _VIDEO_STREAM_RE.search(err)
+    if match:
+        codec, pix_fmt = match.group(1), match.group(2)
+    match = _PROFILE_RE.search(err)
+    if match:
+        profile = match.group(1)
+    match = _TIMESCALE_RE.search(err)
+    if match:
+        timescale = int(float(match.group(1)) * (1000 if match.group(2) else 1))
+    keyframes = sorted(float(t) for t in _PTS_TIME_RE.findall(err))
+    return {"codec": codec, "pix_fmt": pix_fmt, "profile": profile, "timescale": timescale, "keyframes": keyframes}
+
+
+def packet_times(video_path, work_dir, group=None):
+    """
+    不解码，按包列出视频流的显示时间 (秒，升序)；写出的 framemd5 清单放在 work_dir 中
+    """
+    list_path = os.path.join(work_dir, "packets.framemd5")
+    run_ffmpeg(["-i", video_path, "-map", "0:v:0", "-c", "copy", "-f", "framemd5", list_path], group)
+    time_base = 1.0
+    times = []
+    with open(list_path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#tb 0:"):
+                num, _, den = line.split(":", 1)[1].strip().partition("/")
+                time_base = int(num) / int(den)
+            elif not line.startswith("#"):
+                # stream, dts, pts, duration, size, hash
+                fields = [field.strip() for field in line.split(",")]
+                times.append(int(fields[2]) * time_base)
+    os.remove(list_path)
+    return sorted(times)
+
+
+class SceneExporter:
+    """
+    按导出模式把同一源视频的场景写出
+
+    所有编码都由 ffmpeg 子进程完成，threads 为每个编码进程的线程预算，
+    子进程登记在 group 中，以便中断时立即结束。smart 模式每个源视频只探测一次关键帧。
+    progress(output_path, seconds) 报告重编码的进度: output_path 为该次 ffmpeg 写出的文件
+    (逐场景时为场景的 partial_path，single_pass 时为分段文件名模板)，seconds 为已编码的时长。
+    """
+
+    def __init__(self, video_path, mode=DEFAULT_EXPORT_MODE, fps=None, threads=None, group=None, progress=None):
+        if mode not in EXPORT_MODES:
+            raise ValueError(f"Unknown export mode: {mode}")
+        self.video_path = video_path
+        self.mode = mode
+        self.fps = fps
+        self.threads = threads
+        self.group = group if group is not None else ProcessGroup()
+        self.progress = progress
+        self.probe = None
+
+        if mode == "smart":
+            self.probe = probe_video(video_path, self.group)
+            if self.probe["codec"] not in SMART_CUT_CODECS:
+                # the re-encoded parts can only be spliced losslessly onto H.264 streams
+                self.mode = "reencode"
+
+    @property
+    def single_pass(self):
+        return self.mode == "single_pass"
+
+    def _run(self, args, output_path=None):
+        progress = None
+        if self.progress is not None and output_path is not None:
+            progress = lambda seconds: self.progress(output_path, seconds)
+        return run_ffmpeg(args, self.group, progress)
+
+    def _encode_args(self, pix_fmt=None):
+        args = ["-c:v", "libx264", "-c:a", "aac"]
+        if pix_fmt:
+            args += ["-pix_fmt", pix_fmt]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        return args
+
+    def export_all(self, scenes):
+        """写出 [(scene_path, start_time, end_time), ...]，single_pass 模式下只编码一次"""
+        if self.single_pass:
+            self.export_single_pass(scenes)
+            # zero-length or otherwise unsplit scenes fall back to a per-scene encode
+            for scene_path, start_time, end_time in scenes:
+                if not os.path.exists(scene_path):
+                    self._write(self.export_reencode, scene_path, start_time, end_time, "yuv420p")
+            return
+        for scene_path, start_time, end_time in scenes:
+            self.export(scene_path, start_time, end_time)
+
+    def export(self, scene_path, start_time, end_time):
+        if self.mode == "single_pass":
+            self.export_all([(scene_path, start_time, end_time)])
+        elif self.mode == "copy":
+            self._write(self.export_copy, scene_path, start_time, end_time)
+        elif self.mode == "smart":
+            self._write(self.export_smart, scene_path, start_time, end_time)
+        else:
+            # same codecs and pixel format as MoviePy's write_videofile
+            self._write(self.export_reencode, scene_path, start_time, end_time, "yuv420p")
+
+    @staticmethod
+    def _write(fn, scene_path, *args):
+        # write under a temporary name and rename when finished, so an existing scene file is always complete
+        tmp_path = partial_path(scene_path)
+        try:
+            fn(tmp_path, *args)
+            os.replace(tmp_path, scene_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def export_reencode(self, scene_path, start_time, end_time, pix_fmt=None):
+        self._run([
+            "-ss", f"{start_time:.6f}", "-i", self.video_path, "-t", f"{end_time - start_time:.6f}",
+            "-map", "0:v:0", "-map", "0:a?",
+        ] + self._encode_args(pix_fmt) + [
+            "-movflags", "+faststart", scene_path,
+        ], scene_path)
+
+    def export_copy(self, scene_path, start_time, end_time, no_frames=None):
+        # -t is checked against decode timestamps, which lag behind with B-frames; when the copied
+        # range ends on a keyframe the exact packet count is known, so limit by frames as well
+        frame_limit = ["-frames:v", str(no_frames)] if no_frames else []
+        self._run([
+            "-ss", f"{start_time:.6f}", "-i", self.video_path, "-t", f"{end_time - start_time:.6f}",
+            "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+        ] + frame_limit + [
+            "-avoid_negative_ts", "make_zero", "-movflags", "+faststart",
+            scene_path,
+        ])
+
+    def export_smart(self, scene_path, start_time, end_time):
+        """
+        帧精确的智能剪切: 只重编码起点到第一个关键帧、最后一个关键帧到终点的 GOP 片段，
+        中间整段流复制，再用 concat 无损拼接
+
+        各视频片段不带音频，按帧数精确截取，拼接时按帧数给出每段时长，音频从源视频按场景范围单独编码；
+        重编码的片段使用源视频的像素格式、profile 与时间基，参数集写在码流中。
+        拼接结果的帧数或时间戳不连续时改为整段重编码。
+        """
+        fps, pix_fmt = self.fps, self.probe["pix_fmt"]
+        # half a frame of tolerance when matching cut points against keyframe timestamps
+        eps = 0.5 / fps
+        keyframes = [t for t in self.probe["keyframes"] if start_time - eps <= t <= end_time + eps]
+        copy_start = keyframes[0] if keyframes else None
+        # closed-GOP streams can be copied exactly up to a keyframe; past the last one, B-frames
+        # make the copied end overshoot, so the fragment after it is re-encoded as well
+        copy_end = end_time if keyframes and keyframes[-1] >= end_time - eps else (keyframes[-1] if keyframes else None)
+
+        if copy_start is None or copy_end - copy_start < eps:
+            # no whole GOP inside the scene: re-encoding it is as cheap as it gets
+            self.export_reencode(scene_path, start_time, end_time, pix_fmt)
+            return
+
+        # every part is bounded by an exact frame count: the head ends on the frame before copy_start
+        total = round((end_time - start_time) * fps)
+        head = round((copy_start - start_time) * fps)
+        middle = round((copy_end - copy_start) * fps)
+        parts = []  # (kind, start, frames)
+        if head > 0:
+            parts.append(("encode", start_time, head))
+        parts.append(("copy", copy_start, middle))
+        if total - head - middle > 0:
+            parts.append(("encode", copy_end, total - head - middle))
+
+        work_dir = tempfile.mkdtemp(prefix=".smartcut_", dir=os.path.dirname(scene_path))
+        try:
+            list_path = os.path.join(work_dir, "list.txt")
+            with open(list_path, "w", encoding="utf-8") as f:
+                for i, (kind, part_start, frames) in enumerate(parts):
+                    name = f"part_{i}.mp4"
+                    self._write_smart_part(kind, part_start, frames, os.path.join(work_dir, name))
+                    # the concat demuxer would otherwise place each part by its container duration
+                    f.write(f"file '{name}'\nduration {frames / fps:.6f}\n")
+            args = [
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-ss", f"{start_time:.6f}", "-t", f"{total / fps:.6f}", "-i", self.video_path,
+                "-map", "0:v:0", "-map", "1:a?", "-c:v", "copy", "-c:a", "aac",
+            ]
+            if self.threads:
+                args += ["-threads", str(self.threads)]
+            self._run(args + ["-movflags", "+faststart", scene_path])
+
+            if not self._frames_continuous(scene_path, total, work_dir):
+                # e.g. a variable frame rate source: the parts do not line up, re-encode the whole scene
+                self.export_reencode(scene_path, start_time, end_time, pix_fmt)
+        finally:
+            for name in os.listdir(work_dir):
+                os.remove(os.path.join(work_dir, name))
+            os.rmdir(work_dir)
+
+    def _write_smart_part(self, kind, part_start, frames, path):
+        # parameter sets go in-band, so every part decodes with its own SPS/PPS after the join
+        annexb = ["-bsf:v", "h264_mp4toannexb"]
+        if kind == "copy":
+            # seek slightly past the keyframe so rounding never lands on the previous GOP; the source
+            # timestamps are kept, so the part starts exactly at its keyframe once concat rebases it
+            self._run([
+                "-ss", f"{part_start + 0.25 / self.fps:.6f}", "-i", self.video_path,
+                "-map", "0:v:0", "-c:v", "copy", "-frames:v", str(frames),
+                "-copyts", "-avoid_negative_ts", "disabled",
+            ] + annexb + [path])
+            return
+        args = [
+            "-ss", f"{part_start:.6f}", "-i", self.video_path,
+            "-map", "0:v:0", "-frames:v", str(frames), "-c:v", "libx264", "-pix_fmt", self.probe["pix_fmt"],
+        ]
+        profile = _X264_PROFILES.get(self.probe["profile"])
+        if profile:
+            args += ["-profile:v", profile]
+        if self.probe["timescale"]:
+            args += ["-video_track_timescale", str(self.probe["timescale"])]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        self._run(args + annexb + [path], path)
+
+    def _frames_continuous(self, scene_path, expected, work_dir):
+        """scene_path 恰有 expected 帧，且相邻帧的显示时间都相差约一帧"""
+        times = packet_times(scene_path, work_dir, self.group)
+        if len(times) != expected:
+            return False
+        frame = 1 / self.fps
+        return all(0.5 * frame < b - a < 1.5 * frame for a, b in zip(times, times[1:]))
+
+    def export_single_pass(self, scenes):
+        """
+        一次解码/编码写出多个场景
+
+        scenes 为 [(scene_path, start_time, end_time), ...]。在所有场景边界强制关键帧，
+        segment muxer 在这些边界处切段，场景对应的分段改名为目标文件，场景之间的转场分段丢弃。
+        """
+        if not scenes:
+            return
+        # boundaries are shifted back by half a frame so keyframe forcing and segment splitting
+        # both land on the first frame of a scene regardless of timestamp rounding
+        half_frame = 0.5 / self.fps
+        boundaries = sorted({t for _, start, end in scenes for t in (start, end) if t > half_frame})
+        times = ",".join(f"{t - half_frame:.6f}" for t in boundaries)
+
+        out_dir = os.path.dirname(scenes[0][0])
+        work_dir = tempfile.mkdtemp(prefix=".segments_", dir=out_dir)
+        pattern = os.path.join(work_dir, "seg_%05d.mp4")
+        try:
+            self._run([
+                "-i", self.video_path, "-map", "0:v:0", "-map", "0:a?",
+                "-force_key_frames", times,
+            ] + self._encode_args("yuv420p") + [
+                "-f", "segment", "-segment_times", times, "-reset_timestamps", "1",
+                "-segment_format", "mp4", "-segment_format_options", "movflags=+faststart",
+                pattern,
+            ], pattern)
+
+            for scene_path, start, end in scenes:
+                if end - start < half_frame:
+                    continue
+                # segment k covers [boundaries[k - 1], boundaries[k]), segment 0 starts at 0
+                segment_idx = 0 if start <= half_frame else boundaries.index(start) + 1
+                segment_path = os.path.join(work_dir, f"seg_{segment_idx:05d}.mp4")
+                if os.path.exists(segment_path):
+                    os.replace(segment_path, scene_path)
+        finally:
+            for name in os.listdir(work_dir):
+                os.remove(os.path.join(work_dir, name))
+            os.rmdir(work_dir)
+
+
+class ExportPool:
+    """
+    场景导出进程池: 最多 workers 个 ffmpeg 编码进程同时运行，每个进程 threads 个编码线程，
+    cpus 不为空时编码进程绑定到这些核心
+
+    可被多个视频同时使用；results() 按完成顺序返回给定任务的结果，
+    cancel() 丢弃排队中的任务并结束正在运行的编码进程。
+    """
+
+    def __init__(self, workers=None, threads=None, cpus=None):
+        cpu_count = len(cpus) if cpus else (os.cpu_count() or 1)
+        self.threads = threads or min(4, cpu_count)
+        self.workers = workers or max(1, cpu_count // self.threads)
+        self.group = ProcessGroup(cpus)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export")
+
+    def exporter(self, video_path, mode=DEFAULT_EXPORT_MODE, fps=None, progress=None):
+        return SceneExporter(video_path, mode, fps=fps, threads=self.threads, group=self.group, progress=progress)
+
+    def submit(self, key, fn, *args):
+        """提交一个导出任务，返回的 future 带有 key 属性"""
+        if self.group.cancelled:
+            raise ExportCancelled()
+        future = self._executor.submit(self._run_job, fn, *args)
+        future.key = key
+        return future
+
+    def _run_job(self, fn, *args):
+        # queued jobs are drained rather than cancelled so results() always sees every future finish
+        if self.group.cancelled:
+            raise ExportCancelled()
+        return fn(*args)
+
+    @staticmethod
+    def results(futures):
+        """
+        按完成顺序产出 (key, error)，error 为 None 表示成功；取消后未完成的任务不会产出
+        """
+        for future in as_completed(futures):
+            error = future.exception()
+            if isinstance(error, ExportCancelled):
+                continue
+            yield future.key, error
+
+    def cancel(self):
+        self.group.kill_all()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
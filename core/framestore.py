@@ -0,0 +1,109 @@
+"""
+磁盘上的解码帧存储
+
+长视频的 48x27 帧可以超过 1 GB (3 小时 60 fps 约 1.4 GB)。开启后解码直接写入 scratch 目录下的
+.npy 文件 (np.lib.format.open_memmap)，返回只读的内存映射数组: 推理、代表帧选取与可视化
+按需读取其中的片段，整段视频不必常驻内存，由操作系统的页缓存决定保留多少。
+
+文件按视频内容指纹 (与预测缓存相同的采样哈希) 命名，同一视频 (即使被复制或改名) 之后的运行
+直接映射已有文件而不再解码。写入先落临时文件再原子改名；超过容量上限时删除最久未使用的文件。
+"""
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from core.cache import default_cache_dir, video_fingerprint
+
+logger = logging.getLogger(__name__)
+
+FRAMES_VERSION = 1
+
+
+class FrameStore:
+
+    def __init__(self, store_dir=None, max_bytes=None):
+        self.store_dir = store_dir or os.path.join(default_cache_dir(), "frames")
+        self.max_bytes = max_bytes
+
+    def fingerprint(self, video_path):
+        return video_fingerprint(video_path)
+
+    def path(self, video_path, frame_shape):
+        fp = self.fingerprint(video_path)
+        size = "x".join(str(n) for n in frame_shape)
+        return os.path.join(self.store_dir, fp[:2], f"{fp}-{size}-v{FRAMES_VERSION}.npy")
+
+    def load(self, video_path, frame_shape):
+        """已存储时返回只读的内存映射数组 [frames, *frame_shape]，否则返回 None"""
+        path = self.path(video_path, frame_shape)
+        try:
+            frames = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            # missing, or a truncated file from a crash: decode again
+            return None
+        if frames.dtype != np.uint8 or frames.shape[1:] != tuple(frame_shape):
+            return None
+        try:
+            # the access time drives pruning, and atime is often not updated by the filesystem
+            os.utime(path)
+        except OSError:
+            pass
+        return frames
+
+    def write(self, video_path, shape, fill):
+        """
+        新建 shape 的 uint8 内存映射数组，fill(array) 把帧写入后提交，返回只读映射
+
+        fill 抛出异常时丢弃临时文件并重新抛出。
+        """
+        path = self.path(video_path, shape[1:])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".npy.part", dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            frames = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=shape)
+            fill(frames)
+            frames.flush()
+            # the map must be closed before the file can be renamed on Windows
+            del frames
+            try:
+                os.replace(tmp_path, path)
+            except PermissionError:
+                # Windows: another process has the same video mapped, its copy is just as good
+                os.remove(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if self.max_bytes:
+            self.prune(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    def prune(self, keep=None):
+        """删除最久未使用的帧文件，直到总大小不超过 max_bytes"""
+        entries = []
+        for root, _, names in os.walk(self.store_dir):
+            for name in names:
+                if name.endswith(".npy"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # still mapped by a running process (Windows)
+                pass
+        if total > self.max_bytes:
+            logger.info(f"帧存储 {self.store_dir} 仍占用 {total / 1e9:.1f} GB，超过上限 {self.max_bytes / 1e9:.1f} GB")
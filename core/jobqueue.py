@@ -0,0 +1,243 @@
+"""
+多节点共享的任务表
+
+几台机器 (图形界面或 python -m core) 指向同一个 NAS 输出目录时，用输出根目录下的
+SQLite 数据库协调: 处理一个视频前先领取 (claim) 它，领取带有租约 (lease)，
+处理期间后台线程定期续约 (heartbeat)，完成后标记为 done。节点崩溃或断网后租约过期，
+其他节点可以重新领取并借助清单 (scenes.json) 从中断处继续。续约时发现租约已被其他节点接管
+(例如 NAS 写入过慢导致租约过期) 的视频不再由本节点持有，通过 on_lost 回调通知调用方停止处理。
+
+任务以视频名 (即输出子目录名) 为键，不同机器上同一 NAS 的挂载路径可以不同。
+数据库使用回滚日志而不是 WAL，因为 WAL 依赖的共享内存在网络文件系统上不可用；
+租约时间使用各节点的系统时间，节点之间的时钟偏差应远小于租约时长。
+
+查看状态:
+    python -m core.jobqueue 输出目录/
+"""
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = ".transvideo-jobs.sqlite"
+DEFAULT_LEASE = 120.0
+# a video whose lease expired this many times (crashes, lost nodes) is marked failed by expire()
+MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    video TEXT PRIMARY KEY,
+    path TEXT,
+    state TEXT NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    error TEXT
+)
+"""
+
+
+def default_node_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """
+    任务状态: pending -> running (owner, lease_until) -> done / failed
+
+    claim() 只在任务未被他人持有有效租约时成功，同一时刻每个视频至多一个节点在处理；
+    领取后租约过期 (节点失联) 满 MAX_ATTEMPTS 次的任务由 expire() 标记为失败，不再被领取。
+    已完成的任务只有在完成时间早于 since (调用方检查输出之前) 时才能再次领取，
+    用于输出被删除或重新切分的情况，避免两个节点先后把同一视频各做一遍。
+
+    on_lost(video) 在续约线程中调用: 本节点持有的视频的租约已被其他节点接管，或续约持续失败直到租约过期。
+    """
+
+    def __init__(self, output_root, node_id=None, lease=DEFAULT_LEASE, on_lost=None):
+        self.path = os.path.join(output_root, DB_NAME)
+        self.node_id = node_id or default_node_id()
+        self.lease = float(lease)
+        self.on_lost = on_lost
+        # video -> lease_until as last written by this node
+        self._held = {}
+        self._lock = threading.Lock()
+        self._heartbeat = None
+        self._stopped = threading.Event()
+        os.makedirs(output_root, exist_ok=True)
+        # autocommit mode, every change runs in an explicit BEGIN IMMEDIATE transaction
+        self._conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute(_SCHEMA)
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def claim(self, video, path=None, since=None):
+        """领取视频，成功返回 True；其他节点正在处理 (租约未过期) 或已在 since 之后完成时返回 False"""
+        now = time.time()
+        self._write("INSERT OR IGNORE INTO jobs (video, path, state, attempts, updated) VALUES (?, ?, 'pending', 0, ?)",
+                    (video, path, now))
+        claimed = self._write(
+            "UPDATE jobs SET state = 'running', owner = ?, lease_until = ?, attempts = attempts + 1, "
+            "updated = ?, path = COALESCE(?, path), error = NULL "
+            "WHERE video = ? AND ((state IN ('pending', 'failed') AND attempts < ?) "
+            "OR (state = 'running' AND ((lease_until < ? AND attempts < ?) OR owner = ?)) "
+            "OR (state = 'done' AND updated < ?))",
+            (self.node_id, now + self.lease, now, path, video, MAX_ATTEMPTS, now, MAX_ATTEMPTS, self.node_id,
+             since if since is not None else float("-inf")))
+        if claimed:
+            with self._lock:
+                self._held[video] = now + self.lease
+            self._start_heartbeat()
+        else:
+            # the refusal may be a claim whose node kept dying: record it as failed instead of running
+            self.expire(video)
+        return bool(claimed)
+
+    def expire(self, video=None):
+        """把租约已过期且尝试次数用尽的任务标记为失败，video 为 None 时检查全部任务；返回标记的数量"""
+        now = time.time()
+        sql = ("UPDATE jobs SET state = 'failed', owner = NULL, lease_until = NULL, updated = ?, error = ? "
+               "WHERE state = 'running' AND lease_until < ? AND attempts >= ?")
+        params = [now, f"租约过期 {MAX_ATTEMPTS} 次 (节点处理时崩溃或失联)，不再领取", now, MAX_ATTEMPTS]
+        if video is not None:
+            sql += " AND video = ?"
+            params.append(video)
+        return self._write(sql, params)
+
+    def _finish(self, video, state, error=None, attempts="attempts"):
+        with self._lock:
+            self._held.pop(video, None)
+        return self._write(f"UPDATE jobs SET state = ?, owner = NULL, lease_until = NULL, updated = ?, error = ?, "
+                           f"attempts = {attempts} WHERE video = ? AND owner = ?",
+                           (state, time.time(), error, video, self.node_id))
+
+    def complete(self, video):
+        self._finish(video, "done", attempts="0")
+
+    def fail(self, video, error):
+        self._finish(video, "failed", str(error)[:1000])
+
+    def fail_held(self, error):
+        """把本节点仍持有的任务全部标记为失败"""
+        with self._lock:
+            held = list(self._held)
+        for video in held:
+            self.fail(video, error)
+
+    def release(self, video):
+        """放弃已领取的任务 (例如中断)，不计入尝试次数，其他节点可立即领取"""
+        self._finish(video, "pending", attempts="attempts - 1")
+
+    def heartbeat(self):
+        """为本节点持有的所有任务续约，返回续约成功的数量；已被其他节点接管的任务交给 _lose"""
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return 0
+        until = time.time() + self.lease
+        placeholders = ",".join("?" * len(held))
+        renewed = self._write(f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND state = 'running' "
+                              f"AND video IN ({placeholders})", (until, self.node_id, *held))
+        owned = set(held)
+        if renewed < len(held):
+            with self._lock:
+                owned = {row[0] for row in self._conn.execute(
+                    f"SELECT video FROM jobs WHERE owner = ? AND state = 'running' AND video IN ({placeholders})",
+                    (self.node_id, *held))}
+            self._lose([video for video in held if video not in owned])
+        with self._lock:
+            for video in owned:
+                if video in self._held:
+                    self._held[video] = until
+        return renewed
+
+    def _lose(self, videos):
+        """不再持有这些视频并通知 on_lost；已完成或释放的视频 (不在 _held 中) 不通知"""
+        with self._lock:
+            lost = [video for video in videos if self._held.pop(video, None) is not None]
+        for video in lost:
+            logger.warning(f"{video} 的租约已失效，可能已由其他节点接管")
+            if self.on_lost is not None:
+                self.on_lost(video)
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        # renew well before expiry so one slow write on the NAS does not lose the lease
+        while not self._stopped.wait(self.lease / 4):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                logger.warning(f"任务租约续约失败: {e}")
+                # no renewal reached the table: past its lease another node may already have the video
+                now = time.time()
+                with self._lock:
+                    expired = [video for video, until in self._held.items() if until < now]
+                self._lose(expired)
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return dict(rows)
+
+    def jobs(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT video, state, owner, lease_until, attempts, updated, error FROM jobs ORDER BY video").fetchall()
+
+    def close(self):
+        """释放仍持有的任务并关闭数据库"""
+        self._stopped.set()
+        with self._lock:
+            held = list(self._held)
+        for video in held:
+            self.release(video)
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m core.jobqueue", description="查看共享任务表的状态")
+    parser.add_argument("output_dir")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.output_dir, DB_NAME)):
+        print(f"no job table in {args.output_dir}")
+        return 1
+    queue = JobQueue(args.output_dir)
+    # claims whose nodes kept dying are shown as failed, not as running
+    queue.expire()
+    now = time.time()
+    for video, state, owner, lease_until, attempts, updated, error in queue.jobs():
+        lease = f"lease {lease_until - now:+.0f}s" if lease_until else ""
+        print(f"{state:8} {video:40} {owner or '':30} {lease:14} attempts={attempts} {error or ''}")
+    print(", ".join(f"{state}: {n}" for state, n in sorted(queue.counts().items())))
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
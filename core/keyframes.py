@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import numpy as np
+
+from core.exporter import run_ffmpeg
+
+# 关键帧选取方式:
+#   first          - 每个场景的第一帧 (原有行为)
+#   representative - 场景内最接近场景平均画面、且转场概率最低的一帧
+KEYFRAME_MODES = ("first", "representative")
+DEFAULT_KEYFRAME_MODE = "first"
+
+# representative 模式下每个场景最多比较的候选帧数，避免长场景占用过多内存
+MAX_CANDIDATES = 256
+
+
+def first_frames(scenes):
+    return [int(start) for start, _ in scenes]
+
+
+def representative_frames(frames, all_frame_predictions, scenes):
+    """
+    为每个场景选出最有代表性的一帧，返回帧序号列表
+
+    frames 为推理时使用的低分辨率帧 (N, 27, 48, 3)，all_frame_predictions 为逐帧转场概率。
+    候选帧的得分为其与场景平均画面的平均像素差 (归一化到 0-1) 加上转场概率，取最小者，
+    因此淡入淡出、闪白等过渡帧不会被选中。
+    """
+    indices = []
+    for start, end in scenes:
+        start, end = int(start), int(end)
+        step = max(1, (end - start + 1) // MAX_CANDIDATES)
+        candidates = np.arange(start, end + 1, step)
+        feats = frames[candidates].reshape(len(candidates), -1).astype(np.float32)
+        score = np.abs(feats - feats.mean(axis=0)).mean(axis=1) / 255.
+        if all_frame_predictions is not None:
+            score += all_frame_predictions[candidates]
+        indices.append(int(candidates[np.argmin(score)]))
+    return indices
+
+
+def save_keyframes(video_path, frame_indices, out_paths, group=None):
+    """
+    一次顺序解码源视频，把 frame_indices 对应的全分辨率帧写为 out_paths 中的 jpg
+
+    用 select 滤镜按帧序号挑选，代替逐场景随机 seek。返回成功写出的路径列表，
+    帧序号超出视频长度的条目不会写出。
+    """
+    if not frame_indices:
+        return []
+    pairs = sorted(zip(frame_indices, out_paths))
+    expr = "+".join(f"eq(n\\,{int(n)})" for n, _ in pairs)
+
+    out_dir = os.path.dirname(pairs[0][1])
+    work_dir = tempfile.mkdtemp(prefix=".keyframes_", dir=out_dir)
+    try:
+        # long select expressions go through a filter script to stay clear of command line limits
+        script_path = os.path.join(work_dir, "select.txt")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(f"select='{expr}'")
+        run_ffmpeg([
+            "-i", video_path, "-map", "0:v:0", "-an", "-sn",
+            "-filter_script:v", script_path, "-fps_mode", "passthrough",
+            "-q:v", "2", "-start_number", "0", os.path.join(work_dir, "%06d.jpg"),
+        ], group)
+
+        written = []
+        # selected frames come out in decode order, numbered from 0
+        for i, (_, out_path) in enumerate(pairs):
+            frame_path = os.path.join(work_dir, f"{i:06d}.jpg")
+            if os.path.exists(frame_path):
+                os.replace(frame_path, out_path)
+                written.append(out_path)
+        return written
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
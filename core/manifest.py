@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import threading
+
+from core.cache import sampled_hash
+
+# 每个视频输出目录下的清单文件: 源视频指纹、场景列表与每个场景的完成状态
+MANIFEST_NAME = "scenes.json"
+MANIFEST_VERSION = 2
+
+
+def manifest_path(output_dir):
+    return os.path.join(output_dir, MANIFEST_NAME)
+
+
+def source_fingerprint(video_path, previous=None):
+    """
+    源视频指纹 {"size", "mtime", "hash"}
+
+    previous 与当前文件的 size 和 mtime 都相同时直接沿用其采样哈希，不再读取文件。
+    """
+    st = os.stat(video_path)
+    if previous and previous.get("size") == st.st_size and previous.get("mtime") == st.st_mtime_ns:
+        return dict(previous)
+    return {"size": st.st_size, "mtime": st.st_mtime_ns, "hash": sampled_hash(video_path, st.st_size)}
+
+
+def diff_scenes(old_scenes, new_scenes):
+    """
+    比较新旧场景列表 (均为 [(start_frame, end_frame), ...])
+
+    返回 (kept, stale): kept 为 {新序号: 旧序号}，边界完全相同的场景沿用已导出的文件；
+    stale 为边界已变化、需要删除的旧序号列表。序号从 0 开始。
+    """
+    old_index = {(int(s), int(e)): i for i, (s, e) in enumerate(old_scenes)}
+    kept = {}
+    for i, (s, e) in enumerate(new_scenes):
+        j = old_index.get((int(s), int(e)))
+        if j is not None:
+            kept[i] = j
+    reused = set(kept.values())
+    stale = [j for j in range(len(old_scenes)) if j not in reused]
+    return kept, stale
+
+
+class SceneManifest:
+    """
+    单个视频的清单
+
+    scenes 中每项为 {"start", "end", "name", "exported", "keyframe"}，
+    场景文件与关键帧写完并改名到位后才标记为完成。每次修改都整体重写清单
+    (临时文件 + 原子替换)，中断时磁盘上总是一份完整的旧清单或新清单。
+    """
+
+    def __init__(self, output_dir, data=None):
+        self.output_dir = output_dir
+        self.data = data if data is not None else {"scenes": []}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, output_dir):
+        """读取清单，不存在或无法解析时返回 None"""
+        path = manifest_path(output_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version", 1) < 2:
+            # version 1 only stored the scene bounds, existing files stand in for the completion state
+            video_name = os.path.basename(os.path.normpath(output_dir))
+            scenes = []
+            for i, (s, e) in enumerate(data.get("scenes", [])):
+                name = f"{video_name}_scene_{i + 1:03d}"
+                scenes.append({
+                    "start": int(s), "end": int(e), "name": name,
+                    "exported": os.path.exists(os.path.join(output_dir, f"{name}.mp4")),
+                    "keyframe": os.path.exists(os.path.join(output_dir, "keyframes", f"{name}.jpg")),
+                })
+            data["scenes"] = scenes
+        return cls(output_dir, data)
+
+    @property
+    def scenes(self):
+        return self.data["scenes"]
+
+    @property
+    def source(self):
+        return self.data.get("source")
+
+    def bounds(self):
+        return [(scene["start"], scene["end"]) for scene in self.scenes]
+
+    def scene_path(self, idx):
+        return os.path.join(self.output_dir, f"{self.scenes[idx]['name']}.mp4")
+
+    def keyframe_path(self, idx):
+        return os.path.join(self.output_dir, "keyframes", f"{self.scenes[idx]['name']}.jpg")
+
+    def done_count(self):
+        return sum(1 for scene in self.scenes if scene["exported"])
+
+    @property
+    def complete(self):
+        """所有场景已导出，且需要关键帧时所有关键帧已写出"""
+        if not self.scenes:
+            return False
+        keyframes = self.data.get("keyframes", False)
+        return all(scene["exported"] and (scene["keyframe"] or not keyframes) for scene in self.scenes)
+
+    def mark(self, indices, key):
+        """把 indices 中的场景标记为完成 (key 为 "exported" 或 "keyframe") 并保存"""
+        with self._lock:
+            for idx in indices:
+                self.scenes[idx][key] = True
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        self.data["version"] = MANIFEST_VERSION
+        self.data["complete"] = self.complete
+        fd, tmp_path = tempfile.mkstemp(prefix=".scenes_", suffix=".json", dir=self.output_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, manifest_path(self.output_dir))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,48 @@
+"""
+合并导出: 把输出目录下所有视频的分割片段复制到 merged/ 并按顺序重命名为 001.mp4、002.mp4 ...
+
+已有的关键帧一并复制到 merged/thumbnails/，不重新提取。
+"""
+import os
+import shutil
+
+MERGED_DIR = "merged"
+
+
+def collect_scene_files(output_root):
+    """按视频目录与文件名顺序列出 [(片段路径, 关键帧路径或 "")]"""
+    items = []
+    for video_folder in sorted(os.listdir(output_root)):
+        folder_path = os.path.join(output_root, video_folder)
+        if os.path.isdir(folder_path) and video_folder != MERGED_DIR:
+            keyframes_folder = os.path.join(folder_path, "keyframes")
+            scene_files = sorted([f for f in os.listdir(folder_path) if f.endswith('.mp4')])
+            for sf in scene_files:
+                # Keyframe has same name but .jpg extension
+                kf_name = sf.replace('.mp4', '.jpg')
+                kf_path = os.path.join(keyframes_folder, kf_name) if os.path.exists(keyframes_folder) else ""
+                items.append((os.path.join(folder_path, sf), kf_path))
+    return items
+
+
+def merge_export(output_root, items=None):
+    """
+    复制片段与关键帧到 output_root/merged，返回 (merged_dir, 复制成功数, [(源路径, 异常)])
+    """
+    if items is None:
+        items = collect_scene_files(output_root)
+    merged_dir = os.path.join(output_root, MERGED_DIR)
+    thumb_dir = os.path.join(merged_dir, "thumbnails")
+    os.makedirs(thumb_dir, exist_ok=True)
+
+    copied, errors = 0, []
+    for idx, (src_video, src_keyframe) in enumerate(items, start=1):
+        try:
+            shutil.copy2(src_video, os.path.join(merged_dir, f"{idx:03d}.mp4"))
+            # Copy existing keyframe (fast!) instead of extracting
+            if src_keyframe and os.path.exists(src_keyframe):
+                shutil.copy2(src_keyframe, os.path.join(thumb_dir, f"{idx:03d}.jpg"))
+            copied += 1
+        except Exception as e:
+            errors.append((src_video, e))
+    return merged_dir, copied, errors
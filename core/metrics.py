@@ -0,0 +1,174 @@
+"""
+分阶段计时与计数
+
+引擎为每个视频记录一份 VideoMetrics: 各阶段 (decode / inference / scenes / export / keyframes)
+的耗时，以及解码帧数、推理窗口数、导出片段数与写出的字节数。视频完成时以
+"video_metrics" 事件发出 (多进程时经事件队列回到主进程)，由 RunMetrics 汇总:
+
+- 每个视频一行追加到 JSONL 文件 (transvideo-metrics.jsonl)
+- 整次运行的累计值写为 Prometheus 文本格式 (transvideo.prom)，每个视频完成后原子替换，
+  可放在 node_exporter 的 textfile collector 目录中被抓取
+- 运行结束时生成各阶段耗时与吞吐的汇总表
+
+流水线各阶段同时运行，阶段耗时之和大于运行的墙钟时间；占比最高的阶段即瓶颈。
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+STAGES = ("decode", "inference", "scenes", "export", "keyframes")
+COUNTERS = ("frames", "windows", "scenes", "scenes_exported", "keyframes", "bytes_written")
+JSONL_NAME = "transvideo-metrics.jsonl"
+PROMETHEUS_NAME = "transvideo.prom"
+
+_HELP = {
+    "frames": "Frames decoded",
+    "windows": "100-frame windows run through the model",
+    "scenes": "Scenes detected",
+    "scenes_exported": "Scene files written",
+    "keyframes": "Keyframe images written",
+    "bytes_written": "Bytes of scene files and keyframes written",
+}
+
+
+class VideoMetrics:
+    """一个视频的阶段耗时 (秒) 与计数，各阶段在不同线程中记录"""
+
+    def __init__(self, video):
+        self.video = video
+        self.seconds = {}
+        self.counters = {}
+        self.cached = False
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            record = {"video": self.video, "cached": self.cached,
+                      "seconds": {stage: round(s, 4) for stage, s in self.seconds.items()}}
+            record.update({name: self.counters.get(name, 0) for name in COUNTERS})
+        decode = self.seconds.get("decode")
+        if decode:
+            record["decode_fps"] = round(record["frames"] / decode, 1)
+        return record
+
+
+def _atomic_write(path, text):
+    # the textfile collector must never read a half-written file
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RunMetrics:
+    """汇总一次运行中所有视频的 video_metrics 记录，并写出 JSONL 与 Prometheus 文件"""
+
+    def __init__(self, metrics_dir):
+        self.metrics_dir = metrics_dir
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.finished = None
+        self.videos = 0
+        self.cached = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+        os.makedirs(metrics_dir, exist_ok=True)
+        self.jsonl_path = os.path.join(metrics_dir, JSONL_NAME)
+        self.prometheus_path = os.path.join(metrics_dir, PROMETHEUS_NAME)
+
+    def add(self, record):
+        with self._lock:
+            self.videos += 1
+            self.cached += bool(record.get("cached"))
+            for stage, seconds in record["seconds"].items():
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            for name in COUNTERS:
+                self.counters[name] += record.get(name, 0)
+            line = json.dumps(dict(record, run=self.run_id, time=round(time.time(), 3)), ensure_ascii=False)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            _atomic_write(self.prometheus_path, self.prometheus_text())
+
+    def finish(self):
+        with self._lock:
+            self.finished = time.time()
+            _atomic_write(self.prometheus_path, self.prometheus_text())
+
+    def prometheus_text(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP transvideo_{name} {help_text}")
+            lines.append(f"# TYPE transvideo_{name} {kind}")
+            for labels, value in samples:
+                # repr keeps full precision (timestamps), integers stay integers
+                lines.append(f"transvideo_{name}{labels} {round(value, 4)!r}")
+
+        # values cover the current (or last) run; they restart with every run
+        metric("run_start_timestamp_seconds", "gauge", "Start of the current or last run", [("", self.started)])
+        end = self.finished or time.time()
+        metric("run_duration_seconds", "gauge", "Wall-clock duration of the run so far", [("", end - self.started)])
+        metric("run_finished", "gauge", "1 once the run has ended", [("", 1 if self.finished else 0)])
+        metric("videos_total", "counter", "Videos finished in this run", [("", self.videos)])
+        metric("videos_cached_total", "counter", "Videos whose predictions came from the cache", [("", self.cached)])
+        metric("stage_seconds_total", "counter", "Busy time per pipeline stage",
+               [(f'{{stage="{stage}"}}', seconds) for stage, seconds in self.seconds.items()])
+        for name in COUNTERS:
+            metric(f"{name}_total", "counter", _HELP[name], [("", self.counters[name])])
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """[(阶段, 耗时, 吞吐说明)]，按耗时降序"""
+        rates = {
+            "decode": lambda s: f"{self.counters['frames'] / s:.0f} 帧/s",
+            "inference": lambda s: f"{self.counters['windows'] / s:.1f} 窗口/s",
+            "export": lambda s: f"{self.counters['scenes_exported'] / s:.2f} 片段/s",
+            "keyframes": lambda s: f"{self.counters['keyframes'] / s:.1f} 张/s",
+        }
+        rows = []
+        for stage, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            if not seconds:
+                continue
+            rate = rates[stage](seconds) if stage in rates and seconds > 0 else ""
+            rows.append((stage, seconds, rate))
+        return rows
+
+    def summary_lines(self):
+        wall = (self.finished or time.time()) - self.started
+        lines = [f"性能统计: {self.videos} 个视频 (缓存命中 {self.cached})，用时 {wall:.1f}s，"
+                 f"解码 {self.counters['frames']} 帧，推理 {self.counters['windows']} 个窗口，"
+                 f"导出 {self.counters['scenes_exported']} 个片段，写入 {self.counters['bytes_written'] / 1e6:.1f} MB",
+                 f"{'阶段':<10}{'耗时(s)':>10}{'占墙钟':>8}  吞吐"]
+        for stage, seconds, rate in self.summary():
+            share = f"{seconds / wall * 100:.0f}%" if wall > 0 else ""
+            lines.append(f"{stage:<10}{seconds:>10.1f}{share:>8}  {rate}")
+        writing = self.seconds.get("export", 0) + self.seconds.get("keyframes", 0)
+        if self.counters["bytes_written"] and writing:
+            lines.append(f"写入速度 {self.counters['bytes_written'] / 1e6 / writing:.1f} MB/s (按导出与关键帧阶段耗时)")
+        return lines
@@ -0,0 +1,152 @@
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# 进程内共享的 TransNetV2 实例，按权重目录区分。TensorFlow 与 MoviePy 只在第一次加载模型时导入，
+# 界面启动时不必等待。本机推理守护进程 (core.daemon) 在运行时优先使用它，本进程不加载模型。
+_models = {}
+_lock = threading.Lock()
+
+
+def _import_transnetv2():
+    try:
+        from transnetv2 import TransNetV2
+    except ImportError:
+        # Fallback if run directly or paths issue
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from transnetv2 import TransNetV2
+    return TransNetV2
+
+
+def _create_model(weights, batch_size=1, options=None, plan=None):
+    start = time.perf_counter()
+    options = dict(options or {})
+    if plan is not None:
+        # thread pools are sized (and pinned) before TensorFlow creates them
+        plan.pin_inference()
+        if options.get("backend") in (None, "savedmodel"):
+            plan.apply_tensorflow()
+        else:
+            options.setdefault("num_threads", plan.tf_intra_threads)
+    TransNetV2 = _import_transnetv2()
+    model = TransNetV2(weights, batch_size=batch_size, **options)
+    # one dummy batch so graph tracing and memory allocation happen here, not on the first video
+    model.warmup()
+    logger.info(f"TransNetV2 导入、加载与预热耗时 {time.perf_counter() - start:.2f}s")
+    return model
+
+
+class _DaemonPredictor:
+    """把窗口发给推理守护进程；守护进程中途退出时改为在本进程加载模型继续推理"""
+
+    def __init__(self, client, weights, options):
+        self.client = client
+        self.weights = weights
+        self.options = options
+        self.local = None
+
+    def __call__(self, windows):
+        from core.daemon import DaemonError
+        if self.local is None:
+            try:
+                return self.client.predict(windows)
+            except (OSError, DaemonError) as e:
+                logger.warning(f"推理守护进程不可用，改为本进程推理: {e}")
+                try:
+                    self.client.close()
+                except OSError:
+                    pass
+                self.local = load_model(self.weights, use_daemon=False, **self.options)
+        return self.local.predict_batch(windows)
+
+
+def _connect_daemon(weights, options):
+    """守护进程在运行且使用相同权重与后端时返回由它推理的 TransNetV2，否则返回 None"""
+    from core.daemon import DaemonClient, ping
+    info = ping()
+    if info is None:
+        return None
+    if weights and os.path.abspath(weights) != info["weights"]:
+        logger.info(f"推理守护进程使用的权重 {info['weights']} 与 {weights} 不同，不使用守护进程")
+        return None
+    backend = options.get("backend") or "savedmodel"
+    if info.get("backend", "savedmodel") != backend:
+        logger.info(f"推理守护进程使用的后端 {info.get('backend')} 与 {backend} 不同，不使用守护进程")
+        return None
+    try:
+        client = DaemonClient()
+    except (OSError, ValueError):
+        return None
+    # unmap the shared memory segment when the process exits
+    atexit.register(client.close)
+    logger.info(f"使用推理守护进程: {client.socket_path}")
+    TransNetV2 = _import_transnetv2()
+    return TransNetV2.with_predictor(_DaemonPredictor(client, weights, options), model_dir=info["weights"],
+                                     backend=backend)
+
+
+def _get(key, create):
+    with _lock:
+        future = _models.get(key)
+        owner = future is None
+        if owner:
+            future = _models[key] = Future()
+    if owner:
+        try:
+            future.set_result(create())
+        except BaseException as e:
+            # forget the failure so a later call (e.g. after the weights are fixed) retries
+            with _lock:
+                _models.pop(key, None)
+            future.set_exception(e)
+    return future.result()
+
+
+def load_model(weights=None, use_daemon=True, batch_size=1, plan=None, **options):
+    """
+    返回共享的 TransNetV2 实例，必要时在当前线程加载；其他线程正在加载同一模型时等待其完成
+
+    use_daemon 时先检查本机推理守护进程，它在运行 (且后端相同) 就把推理交给它，否则在本进程内加载模型。
+    options 为 TransNetV2 的构造参数 (backend、compiled、jit_compile、cache_dir 等)，
+    batch_size 决定预热时的批大小；plan (core.planner.ExecutionPlan) 决定本进程推理的线程数与绑定的核心。
+    """
+    key = (weights or "", tuple(sorted(options.items())))
+    if use_daemon:
+        model = _get(("daemon", key), lambda: _connect_daemon(weights, options))
+        if model is not None:
+            return model
+        # no daemon: forget the miss so one started later is picked up by the next run
+        with _lock:
+            _models.pop(("daemon", key), None)
+    return _get(key, lambda: _create_model(weights, batch_size, options, plan))
+
+
+def preload_model(weights=None, use_daemon=True, plan_config=None, skip=None, **options):
+    """
+    在后台线程加载并预热模型 (options 同 load_model)，加载失败只记录日志，真正使用时会再次报错
+
+    plan_config 不为 None 时先按它规划线程 (见 core.planner.get_plan)，与之后处理时的规划一致。
+    skip(plan) 返回 True 时不加载 (例如处理会交给各自加载模型的工作进程)，规划同样在后台线程中进行。
+    """
+    def run():
+        try:
+            plan = None
+            if plan_config is not None:
+                from core.planner import get_plan
+                plan = get_plan(plan_config)
+            if skip is not None and skip(plan):
+                logger.info("处理将由多个工作进程各自加载模型，跳过本进程的模型预加载")
+                return
+            load_model(weights, use_daemon, plan=plan, **options)
+        except Exception as e:
+            logger.warning(f"后台预加载模型失败: {e}")
+
+    thread = threading.Thread(target=run, name="model-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,131 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class Stage:
+    """
+    流水线中的一个阶段: workers 个线程从输入队列取任务，处理后放入下一阶段的有界队列
+
+    max_batch > 1 时 fn 接收任务列表并返回结果列表: 先阻塞取一个任务，再取出队列中
+    已就绪的任务，直到 max_batch 个或 batch_weight 之和达到 max_batch_weight。
+    fn 返回 None 的任务不再传给下一阶段。
+    """
+
+    def __init__(self, name, fn, workers=1, max_batch=1, batch_weight=None, max_batch_weight=None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.batch_weight = batch_weight
+        self.max_batch_weight = max_batch_weight
+
+
+class Pipeline:
+    """
+    多阶段流水线，阶段之间是容量为 queue_size 的有界队列
+
+    下游处理不过来时上游的 put 会阻塞 (背压)，因此同时在内存中的任务数
+    不超过 阶段数 * (queue_size + workers)。
+    """
+
+    def __init__(self, stages, queue_size=2):
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.error = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """不再送入新任务，各阶段丢弃尚未处理的任务"""
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def run(self, items):
+        """
+        依次送入 items，按完成顺序产出最后一个阶段的结果；任一阶段出错时停止流水线并重新抛出
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages] + [queue.Queue()]
+
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), name="pipeline-feed", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]  # the last worker of a stage to finish forwards _DONE
+            lock = threading.Lock()
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(stage, queues[i], queues[i + 1], remaining, lock),
+                    name=f"pipeline-{stage.name}-{n}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            yield item
+
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _feed(self, items, out_queue):
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    break
+                out_queue.put(item)
+        finally:
+            out_queue.put(_DONE)
+
+    def _take_batch(self, stage, in_queue, first):
+        batch = [first]
+        weight = stage.batch_weight(first) if stage.batch_weight else 0
+        while len(batch) < stage.max_batch:
+            if stage.max_batch_weight is not None and weight >= stage.max_batch_weight:
+                break
+            try:
+                item = in_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                in_queue.put(_DONE)
+                break
+            batch.append(item)
+            if stage.batch_weight:
+                weight += stage.batch_weight(item)
+        return batch
+
+    def _work(self, stage, in_queue, out_queue, remaining, lock):
+        try:
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    # leave the marker for the other workers of this stage
+                    in_queue.put(_DONE)
+                    break
+                batch = self._take_batch(stage, in_queue, item) if stage.max_batch > 1 else [item]
+
+                # after a stop or an error keep draining so upstream puts never block forever
+                if self._stop.is_set():
+                    continue
+                try:
+                    results = stage.fn(batch) if stage.max_batch > 1 else [stage.fn(item)]
+                except BaseException as e:
+                    if self.error is None:
+                        self.error = e
+                    self._stop.set()
+                    continue
+
+                for result in results:
+                    if result is not None:
+                        out_queue.put(result)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                out_queue.put(_DONE)
@@ -0,0 +1,268 @@
+"""
+按本机 CPU 与内存规划执行参数
+
+TensorFlow 的线程池、ffmpeg 编码线程、同时导出的进程数和流水线中同时驻留的视频数
+原先各自按 cpu_count 取值，会在同一批核心上超额订阅。这里统一分配:
+
+- 推理 (TensorFlow intra/inter-op 线程) 占一部分核心，重编码导出时占 1/4，流复制时占 1/2
+- 其余核心给 ffmpeg 编码: 每个进程的线程数由一次简短的校准决定 (在本机测量
+  1/2/4 线程编码同一段合成视频的加速比，取仍保持 75% 以上效率的最大线程数)，
+  校准结果按核心数和 ffmpeg 缓存，之后启动不再重复测量
+- 导出进程数与流水线队列长度再按可用内存封顶
+- 可选把推理与 ffmpeg 编码进程分别绑定到不相交的核心集合 (仅 Linux)
+
+配置中任何一项不为 None 时覆盖规划值。
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# rough resident memory of one unit of work, used to cap concurrency
+MODEL_MEMORY = 1 << 30  # TensorFlow runtime + one TransNetV2 replica
+EXPORT_JOB_MEMORY = 300 << 20  # one libx264 encode of a 1080p source
+DECODED_VIDEO_MEMORY = 512 << 20  # one decoded 48x27 video waiting between stages (~1.5 h at 30 fps)
+
+# config keys the plan fills in; a value set in the config wins over the planned one
+PLAN_KEYS = ("tf_intra_threads", "tf_inter_threads", "encoder_threads", "export_workers",
+             "decode_workers", "export_videos", "pipeline_queue_size")
+
+CALIBRATION_THREADS = (1, 2, 4)
+CALIBRATION_EFFICIENCY = 0.75
+CALIBRATION_VERSION = 1
+
+_plans = {}
+_lock = threading.Lock()
+
+
+def usable_cpus():
+    """本进程可以使用的逻辑 CPU 编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def physical_cores():
+    """物理核心数，无法得知时返回 None"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            cores, physical_id = set(), None
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    cores.add((physical_id, value.strip()))
+        return len(cores) or None
+    except OSError:
+        return None
+
+
+def available_memory():
+    """可用内存字节数，无法得知时返回 None"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if os.name == "nt":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    return None
+
+
+def _encode_seconds(threads):
+    from core.exporter import run_ffmpeg
+    start = time.perf_counter()
+    run_ffmpeg(["-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=25:duration=2",
+                "-c:v", "libx264", "-threads", str(threads), "-f", "null", "-"])
+    return time.perf_counter() - start
+
+
+def calibrate_encoder_threads(cpu_count, cache_dir=None):
+    """
+    测量 ffmpeg libx264 在 1/2/4 线程下的加速比，返回效率不低于 75% 的最大线程数
+
+    结果按核心数与 ffmpeg 路径缓存在 cache_dir/planner.json 中。
+    """
+    from moviepy.config import FFMPEG_BINARY
+    from core.cache import default_cache_dir
+
+    path = os.path.join(cache_dir or default_cache_dir(), "planner.json")
+    key = f"{CALIBRATION_VERSION}:{cpu_count}:{FFMPEG_BINARY}"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["encoder_threads"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    timings = {}
+    best = 1
+    for threads in CALIBRATION_THREADS:
+        if threads > cpu_count:
+            break
+        timings[threads] = _encode_seconds(threads)
+        if timings[1] / timings[threads] / threads < CALIBRATION_EFFICIENCY:
+            break
+        best = threads
+    logger.info("编码线程校准: " + ", ".join(f"{t} 线程 {s:.2f}s" for t, s in timings.items())
+                + f" -> 每个导出进程 {best} 线程")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".json", dir=os.path.dirname(path))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "encoder_threads": best, "timings": timings}, f, indent=2)
+    os.replace(tmp_path, path)
+    return best
+
+
+class ExecutionPlan:
+    """
+    一次运行的线程与并发参数
+
+    inference_cpus / export_cpus 为绑定的核心集合，不绑定时为 None。
+    """
+
+    def __init__(self, cpus, cores, memory, tf_intra_threads, tf_inter_threads, encoder_threads,
+                 export_workers, decode_workers, export_videos, pipeline_queue_size,
+                 inference_cpus=None, export_cpus=None):
+        self.cpus = cpus
+        self.cores = cores
+        self.memory = memory
+        self.tf_intra_threads = tf_intra_threads
+        self.tf_inter_threads = tf_inter_threads
+        self.encoder_threads = encoder_threads
+        self.export_workers = export_workers
+        self.decode_workers = decode_workers
+        self.export_videos = export_videos
+        self.pipeline_queue_size = pipeline_queue_size
+        self.inference_cpus = inference_cpus
+        self.export_cpus = export_cpus
+
+    def describe(self):
+        memory = f"{self.memory / (1 << 30):.1f} GB" if self.memory else "未知"
+        text = (f"执行计划: {self.cpus} 逻辑核心 / {self.cores or '?'} 物理核心，可用内存 {memory}；"
+                f"推理 {self.tf_intra_threads}+{self.tf_inter_threads} 线程，"
+                f"导出 {self.export_workers} 个进程 x {self.encoder_threads} 线程，"
+                f"解码 {self.decode_workers}，同时导出 {self.export_videos} 个视频，"
+                f"队列 {self.pipeline_queue_size}")
+        if self.inference_cpus:
+            text += f"，推理绑定核心 {_format_cpus(self.inference_cpus)}，导出绑定核心 {_format_cpus(self.export_cpus)}"
+        return text
+
+    def apply_tensorflow(self):
+        """设置 TensorFlow 线程池大小，必须在 TensorFlow 执行第一个运算之前调用"""
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(self.tf_intra_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(self.tf_inter_threads)
+        except RuntimeError:
+            # the runtime is already initialised (e.g. a model was loaded earlier in this process)
+            logger.warning("TensorFlow 已初始化，线程池大小保持不变")
+
+    def pin_inference(self):
+        """把当前线程 (及之后由它创建的线程，包括 TensorFlow 线程池) 绑定到推理核心"""
+        if self.inference_cpus:
+            os.sched_setaffinity(0, self.inference_cpus)
+
+
+def _format_cpus(cpus):
+    cpus = sorted(cpus)
+    return f"{cpus[0]}-{cpus[-1]}" if cpus == list(range(cpus[0], cpus[-1] + 1)) else ",".join(map(str, cpus))
+
+
+def make_plan(config):
+    """
+    按本机资源与 config 规划: export_mode、cpu_affinity、planner_calibration、cache_dir 及 PLAN_KEYS 的覆盖值
+
+    config 可以是 dict 或 ConfigManager，只用单参数的 get(key)。
+    """
+    cpus = usable_cpus()
+    count = len(cpus)
+    memory = available_memory()
+    overrides = {key: config.get(key) for key in PLAN_KEYS if config.get(key) is not None}
+
+    def value(key, planned):
+        return max(1, int(overrides.get(key, planned)))
+
+    # stream copy barely uses the CPU, so inference gets a larger share
+    share = 0.5 if config.get("export_mode") == "copy" else 0.25
+    # beyond ~8 threads the small TransNetV2 convolutions stop scaling
+    tf_intra = value("tf_intra_threads", min(8, max(1, round(count * share))))
+    tf_inter = value("tf_inter_threads", 2 if count >= 8 else 1)
+
+    if "encoder_threads" in overrides:
+        encoder_threads = value("encoder_threads", 1)
+    elif config.get("planner_calibration") is not False:
+        try:
+            encoder_threads = calibrate_encoder_threads(count, config.get("cache_dir"))
+        except (IOError, OSError) as e:
+            logger.warning(f"编码线程校准失败，使用默认值: {e}")
+            encoder_threads = min(2, count)
+    else:
+        encoder_threads = min(2, count)
+    encoder_threads = value("encoder_threads", encoder_threads)
+
+    export_workers = max(1, (count - tf_intra) // encoder_threads)
+    queue_size = 2
+    if memory is not None:
+        budget = max(0, memory - MODEL_MEMORY)
+        queue_size = min(queue_size, max(1, int(budget // 2 // DECODED_VIDEO_MEMORY)))
+        export_workers = min(export_workers, max(1, int(budget // 2 // EXPORT_JOB_MEMORY)))
+    export_workers = value("export_workers", export_workers)
+
+    plan = ExecutionPlan(
+        cpus=count,
+        cores=physical_cores(),
+        memory=memory,
+        tf_intra_threads=tf_intra,
+        tf_inter_threads=tf_inter,
+        encoder_threads=encoder_threads,
+        export_workers=export_workers,
+        decode_workers=value("decode_workers", 1 if count <= 4 else 2),
+        export_videos=value("export_videos", 2 if export_workers >= 2 else 1),
+        pipeline_queue_size=value("pipeline_queue_size", queue_size),
+    )
+    if config.get("cpu_affinity") and hasattr(os, "sched_setaffinity") and count > tf_intra:
+        plan.inference_cpus = set(cpus[:tf_intra])
+        plan.export_cpus = set(cpus[tf_intra:])
+    return plan
+
+
+def get_plan(config):
+    """进程内按配置缓存的执行计划，图形界面预加载模型与之后的处理使用同一份"""
+    key = json.dumps({k: config.get(k) for k in PLAN_KEYS + ("export_mode", "cpu_affinity", "planner_calibration")},
+                     sort_keys=True, default=str)
+    with _lock:
+        plan = _plans.get(key)
+    if plan is None:
+        plan = make_plan(config)
+        logger.info(plan.describe())
+        with _lock:
+            plan = _plans.setdefault(key, plan)
+    return plan
@@ -0,0 +1,179 @@
+"""
+多进程处理: N 个工作进程各自加载一份模型，从共享队列领取视频
+
+每个工作进程运行一个 BatchEngine 流水线，视频按需从队列中取出，进程之间自动均衡。
+工作进程的事件 (日志、结果、单个视频进度、完成) 经事件队列汇总到主进程，
+由 ProcessPoolEngine 以与 BatchEngine 相同的 callback(event, data) 发出，
+总进度由主进程统一计算，因此图形界面与命令行无需区分单进程与多进程。
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from core.engine import BatchEngine
+from core.planner import (DECODED_VIDEO_MEMORY, EXPORT_JOB_MEMORY, MODEL_MEMORY, get_plan,
+                          usable_cpus)
+
+logger = logging.getLogger(__name__)
+
+# memory one replica needs: its own TensorFlow runtime and model, a decoded video and two encodes
+REPLICA_MEMORY = MODEL_MEMORY + DECODED_VIDEO_MEMORY + 2 * EXPORT_JOB_MEMORY
+# cores one replica should have to itself before another replica pays off
+REPLICA_CPUS = 8
+STOP_POLL_INTERVAL = 0.2
+
+
+def worker_count(config, plan, videos):
+    """
+    工作进程数: worker_processes 配置 (0 / None 为自动: 每 8 个核心一个)，
+    再按每份模型副本的内存估计与视频数封顶
+    """
+    requested = config.get("worker_processes")
+    count = requested if requested else plan.cpus // REPLICA_CPUS
+    if plan.memory is not None:
+        by_memory = max(1, int(plan.memory // REPLICA_MEMORY))
+        if count > by_memory:
+            logger.info(f"可用内存只够 {by_memory} 个模型副本，工作进程数从 {count} 降为 {by_memory}")
+            count = by_memory
+    return max(1, min(count, videos))
+
+
+def uses_worker_processes(config, plan):
+    """视频足够多时是否会启动多个工作进程；此时模型只在工作进程中加载，主进程中的模型不会被使用"""
+    return worker_count(config, plan, sys.maxsize) > 1
+
+
+def _worker_config(config, plan, count, worker_id, prefiltered_at=None):
+    # each replica plans for its share of the machine; with cpu_affinity it is pinned to a
+    # disjoint slice of the cores and plans for that slice itself
+    config = dict(config)
+    config["_prefiltered_at"] = prefiltered_at
+    if config.get("cpu_affinity") and hasattr(os, "sched_setaffinity"):
+        cpus = usable_cpus()
+        config["_cpus"] = cpus[worker_id::count]
+        return config
+    share = {
+        "tf_intra_threads": max(1, plan.tf_intra_threads // count),
+        "tf_inter_threads": 1,
+        "export_workers": max(1, plan.export_workers // count),
+        "encoder_threads": plan.encoder_threads,
+        "decode_workers": 1,
+        "export_videos": max(1, plan.export_videos // count),
+        # claim few videos ahead so the others stay in the shared queue for idle workers
+        "pipeline_queue_size": 1,
+    }
+    for key, value in share.items():
+        if config.get(key) is None:
+            config[key] = value
+    return config
+
+
+def _worker_main(worker_id, config, tasks, events, stop_flag):
+    # Ctrl+C reaches the whole process group; stopping is coordinated by the parent
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cpus = config.pop("_cpus", None)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    engine = BatchEngine(config, lambda event, data: events.put((worker_id, event, data)))
+    engine.prefiltered_at = config.get("_prefiltered_at")
+
+    def watch_stop():
+        while not stop_flag.value:
+            time.sleep(STOP_POLL_INTERVAL)
+        engine.stop()
+
+    threading.Thread(target=watch_stop, name="stop-watcher", daemon=True).start()
+    error = None
+    try:
+        engine.process(iter(tasks.get, None), total=len(config.get("files", [])))
+    except Exception as e:
+        error = str(e)
+    finally:
+        events.put((worker_id, "exit", {"error": error}))
+
+
+class ProcessPoolEngine(BatchEngine):
+    """
+    与 BatchEngine 相同的接口与事件；需要处理的视频不止一个且工作进程数大于 1 时
+    分发给多个进程，否则在本进程内处理
+    """
+
+    def __init__(self, config, callback=None):
+        super().__init__(config, callback)
+        self._stop_flag = None
+
+    def stop(self):
+        super().stop()
+        if self._stop_flag is not None:
+            self._stop_flag.value = 1
+
+    def process(self, to_process, completed=0, total=None):
+        to_process = list(to_process)
+        plan = get_plan(self.config)
+        count = worker_count(self.config, plan, len(to_process))
+        if count <= 1:
+            return super().process(to_process, completed, total)
+
+        self.emit("log", message=f"启动 {count} 个工作进程，每个进程加载一份模型")
+        # spawn: the parent may hold Qt and TensorFlow state that must not be forked
+        context = multiprocessing.get_context("spawn")
+        tasks, events = context.Queue(), context.Queue()
+        # a lock-free shared flag: a worker killed while waiting on it cannot leave it in a broken state
+        self._stop_flag = context.RawValue("b", 1 if self.is_interrupted else 0)
+        for item in to_process:
+            tasks.put(item)
+        for _ in range(count):
+            tasks.put(None)
+
+        workers = {}
+        for worker_id in range(count):
+            proc = context.Process(target=_worker_main, name=f"transvideo-worker-{worker_id}", daemon=True,
+                                   args=(worker_id, _worker_config(self.config, plan, count, worker_id,
+                                                                   self.prefiltered_at),
+                                         tasks, events, self._stop_flag))
+            proc.start()
+            workers[worker_id] = proc
+
+        errors = []
+        running = set(workers)
+        try:
+            while running:
+                try:
+                    worker_id, event, data = events.get(timeout=0.5)
+                except queue.Empty:
+                    # a worker that died without reporting (crash, killed for memory)
+                    for worker_id in [w for w in running if not workers[w].is_alive()]:
+                        running.discard(worker_id)
+                        errors.append(f"工作进程 {worker_id} 异常退出 (exit code {workers[worker_id].exitcode})")
+                    continue
+                if event == "exit":
+                    running.discard(worker_id)
+                    if data["error"]:
+                        errors.append(f"工作进程 {worker_id}: {data['error']}")
+                elif event == "progress":
+                    # per-worker counts; overall progress is counted here from video_done
+                    continue
+                elif event in ("video_done", "video_skipped"):
+                    completed += 1
+                    self.emit(event, **data)
+                    self.emit("progress", current=completed, total=total)
+                elif event == "log":
+                    self.emit("log", message=f"[进程 {worker_id + 1}] {data['message']}")
+                else:
+                    self.emit(event, **data)
+        finally:
+            if running:
+                self._stop_flag.value = 1
+            # tasks left behind after a stop must not keep this process waiting on the queue
+            tasks.cancel_join_thread()
+            for proc in workers.values():
+                proc.join(timeout=10)
+                if proc.is_alive():
+                    proc.kill()
+        if errors and not self.is_interrupted:
+            raise RuntimeError("; ".join(errors))
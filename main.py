@@ -1,6 +1,11 @@
 
+import time
+_START = time.perf_counter()
+
 import sys
 import logging
+import multiprocessing
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
 from main_window import MainWindow
 
@@ -13,8 +18,17 @@ def main():
     
     window = MainWindow()
     window.show()
+    startup = time.perf_counter() - _START
+    logging.info(f"界面启动耗时 {startup:.2f}s")
+    window.append_log(f"界面启动耗时 {startup:.2f}s")
+    
+    # Load and warm up TransNetV2 in the background once the window is up,
+    # so the first "智能分割" click does not pay for importing TensorFlow
+    QTimer.singleShot(0, window.preload_model)
     
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # worker processes of core.pool are spawned; needed when the app is frozen into an executable
+    multiprocessing.freeze_support()
     main()
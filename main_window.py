@@ -1,6 +1,5 @@
 import os
 import sys
-import shutil
 import logging
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                                QLabel, QLineEdit, QPushButton, QComboBox, 
@@ -8,7 +7,7 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QCheckBox, QGroupBox, QScrollArea, QGridLayout, 
                                QFrame, QMessageBox, QGraphicsDropShadowEffect,
                                QListWidget, QListWidgetItem, QAbstractItemView, 
-                               QSplitter, QToolButton)
+                               QSplitter, QToolButton, QDoubleSpinBox)
 from PySide6.QtCore import Qt, QThread, Slot, QSize, QUrl, QTimer
 from PySide6.QtGui import QIcon, QPixmap, QDesktopServices, QColor, QFont
 
@@ -31,6 +30,10 @@ except ImportError:
 
 from core.processor import TransNetWorker
 from core.config import ConfigManager
+from core.manifest import SceneManifest
+from core.merge import collect_scene_files, merge_export
+from core.model import preload_model
+from core.pool import uses_worker_processes
 
 class FileListItem(QWidget):
     """自定义文件列表项组件"""
@@ -123,6 +126,9 @@ class MainWindow(QMainWindow):
             self.load_folder(last_folder)
             
         self.check_keyframes.setChecked(self.config.get("extract_keyframes"))
+        export_idx = self.combo_export_mode.findData(self.config.get("export_mode"))
+        self.combo_export_mode.setCurrentIndex(max(0, export_idx))
+        self.spin_threshold.setValue(self.config.get("threshold"))
 
     def setup_styles(self):
         # Force Light Theme - Element Plus Style with ID Selectors
@@ -374,6 +380,38 @@ class MainWindow(QMainWindow):
         self.check_keyframes.stateChanged.connect(lambda s: self.config.set("extract_keyframes", bool(s)))
         action_layout.addWidget(self.check_keyframes)
         
+        export_row = QHBoxLayout()
+        export_label = QLabel("导出方式")
+        export_label.setStyleSheet("font-size: 14px; color: #606266;")
+        export_row.addWidget(export_label)
+        self.combo_export_mode = QComboBox()
+        self.combo_export_mode.addItem("重新编码 (兼容性最好)", "reencode")
+        self.combo_export_mode.addItem("流复制 (最快, 切点对齐关键帧)", "copy")
+        self.combo_export_mode.addItem("智能剪切 (帧精确, 接近复制速度)", "smart")
+        self.combo_export_mode.addItem("单次编码 (一次导出全部场景)", "single_pass")
+        self.combo_export_mode.currentIndexChanged.connect(
+            lambda i: self.config.set("export_mode", self.combo_export_mode.itemData(i)))
+        export_row.addWidget(self.combo_export_mode, 1)
+        action_layout.addLayout(export_row)
+        
+        threshold_row = QHBoxLayout()
+        threshold_label = QLabel("切分阈值")
+        threshold_label.setStyleSheet("font-size: 14px; color: #606266;")
+        threshold_row.addWidget(threshold_label)
+        self.spin_threshold = QDoubleSpinBox()
+        self.spin_threshold.setRange(0.05, 0.95)
+        self.spin_threshold.setSingleStep(0.05)
+        self.spin_threshold.setDecimals(2)
+        self.spin_threshold.valueChanged.connect(lambda v: self.config.set("threshold", round(v, 2)))
+        threshold_row.addWidget(self.spin_threshold, 1)
+        # Re-cut reuses cached predictions: only scenes whose boundaries changed are re-exported
+        self.recut_btn = QPushButton("重新切分")
+        self.recut_btn.setCursor(Qt.PointingHandCursor)
+        self.recut_btn.setToolTip("使用新阈值重新切分已处理的视频，只重新导出边界变化的片段")
+        self.recut_btn.clicked.connect(lambda: self.start_processing(recut=True))
+        threshold_row.addWidget(self.recut_btn)
+        action_layout.addLayout(threshold_row)
+        
         btn_box = QHBoxLayout()
         btn_box.setSpacing(12)
         
@@ -588,7 +626,15 @@ class MainWindow(QMainWindow):
             # Check if this file is ALREADY processed and update status immediately
             vname = os.path.splitext(os.path.basename(path))[0]
             output_path = os.path.join(folder, "output", vname)
-            if os.path.exists(output_path) and len(os.listdir(output_path)) > 0:
+            manifest = SceneManifest.load(output_path)
+            if manifest is not None:
+                if manifest.complete:
+                    widget.set_status("✅ 已完成", "#67C23A")
+                    widget.state_icon.setStyleSheet("border-radius: 5px; background-color: #67C23A;")
+                elif manifest.scenes:
+                    widget.set_status(f"部分完成 {manifest.done_count()}/{len(manifest.scenes)}", "#E6A23C")
+            # Output of an older version without a manifest
+            elif os.path.exists(output_path) and len(os.listdir(output_path)) > 0:
                  widget.set_status("✅ 已完成", "#67C23A") 
                  widget.state_icon.setStyleSheet("border-radius: 5px; background-color: #67C23A;")
 
@@ -625,7 +671,19 @@ class MainWindow(QMainWindow):
             kf_dir = os.path.join(self.current_output_folder, "keyframes")
             
             # Load existing results if available
-            if os.path.exists(kf_dir):
+            manifest = SceneManifest.load(self.current_output_folder)
+            if manifest is not None:
+                for i, scene in enumerate(manifest.scenes):
+                    if scene["keyframe"] or scene["exported"]:
+                        self.add_result_item({
+                            "type": "keyframe",
+                            "scene_index": i + 1,
+                            "image_path": manifest.keyframe_path(i),
+                            "video_path": manifest.scene_path(i)
+                        })
+                if manifest.scenes:
+                    self.open_folder_btn.setVisible(True)
+            elif os.path.exists(kf_dir):
                 kf_files = sorted([f for f in os.listdir(kf_dir) if f.endswith('.jpg')])
                 if kf_files:
                     for kf in kf_files:
@@ -643,7 +701,15 @@ class MainWindow(QMainWindow):
                         except: pass
                     self.open_folder_btn.setVisible(True)
 
-    def start_processing(self):
+    def preload_model(self):
+        if self.config.get("preload_model"):
+            preload_model(self.config.get("weights"), use_daemon=self.config.get("use_daemon"),
+                          batch_size=self.config.get("batch_size"), backend=self.config.get("backend"),
+                          compiled=self.config.get("compiled_inference"), jit_compile=self.config.get("xla"),
+                          cache_dir=self.config.get("cache_dir"), plan_config=self.config,
+                          skip=lambda plan: uses_worker_processes(self.config, plan))
+
+    def start_processing(self, recut=False):
         tasks = []
         for w in self.files_map.values():
             if w.checkbox.isChecked():
@@ -669,7 +735,36 @@ class MainWindow(QMainWindow):
         config = {
             'files': tasks,
             'output_dir': output_dir,
-            'extract_keyframes': self.check_keyframes.isChecked()
+            'extract_keyframes': self.check_keyframes.isChecked(),
+            'batch_size': self.config.get("batch_size"),
+            'weights': self.config.get("weights"),
+            'use_daemon': self.config.get("use_daemon"),
+            'backend': self.config.get("backend"),
+            'compiled_inference': self.config.get("compiled_inference"),
+            'xla': self.config.get("xla"),
+            'export_mode': self.combo_export_mode.currentData(),
+            'export_workers': self.config.get("export_workers"),
+            'encoder_threads': self.config.get("encoder_threads"),
+            'decode_workers': self.config.get("decode_workers"),
+            'export_videos': self.config.get("export_videos"),
+            'pipeline_queue_size': self.config.get("pipeline_queue_size"),
+            'tf_intra_threads': self.config.get("tf_intra_threads"),
+            'tf_inter_threads': self.config.get("tf_inter_threads"),
+            'cpu_affinity': self.config.get("cpu_affinity"),
+            'planner_calibration': self.config.get("planner_calibration"),
+            'worker_processes': self.config.get("worker_processes"),
+            'job_queue': self.config.get("job_queue"),
+            'job_lease': self.config.get("job_lease"),
+            'metrics': self.config.get("metrics"),
+            'metrics_dir': self.config.get("metrics_dir"),
+            'frame_store': self.config.get("frame_store"),
+            'frame_store_dir': self.config.get("frame_store_dir"),
+            'frame_store_max_gb': self.config.get("frame_store_max_gb"),
+            'keyframe_mode': self.config.get("keyframe_mode"),
+            'threshold': self.spin_threshold.value(),
+            'recut': bool(recut),
+            'prediction_cache': self.config.get("prediction_cache"),
+            'cache_dir': self.config.get("cache_dir")
         }
         
         self.thread = QThread()
@@ -680,6 +775,7 @@ class MainWindow(QMainWindow):
         self.worker.signals.error.connect(self.on_error)
         self.worker.signals.log.connect(self.append_log)
         self.worker.signals.progress_total.connect(self.update_total_progress)
+        self.worker.signals.progress_item.connect(self.update_item_progress)
         self.worker.signals.result.connect(self.add_result_item)
         
         # Cleanup
@@ -697,6 +793,7 @@ class MainWindow(QMainWindow):
 
     def toggle_ui(self, processing):
         self.start_btn.setEnabled(not processing)
+        self.recut_btn.setEnabled(not processing)
         self.browse_btn.setEnabled(not processing)
         self.stop_btn.setEnabled(processing)
         self.path_edit.setEnabled(not processing)
@@ -705,6 +802,18 @@ class MainWindow(QMainWindow):
         pct = int(current_idx / total * 100)
         self.progress_bar.setValue(pct)
 
+    def update_item_progress(self, fname, pct, detail=""):
+        # Several videos are in flight at once, so progress is tracked per list item
+        for w in self.files_map.values():
+            if os.path.basename(os.path.splitext(w.path)[0]) == fname:
+                if pct >= 100:
+                    w.set_status("✅ 已完成", "#67C23A")
+                    w.state_icon.setStyleSheet("background-color: #67C23A;")
+                elif detail:
+                    w.set_status(f"{pct}% {detail}", "#409EFF")
+                else:
+                    w.set_status(f"正在处理... {pct}%", "#409EFF")
+
     def append_log(self, text):
         if text.startswith("FINISH_SIGNAL:"):
              fname = text.split(":")[1]
@@ -866,49 +975,15 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "未找到 output 文件夹，请先处理视频")
             return
         
-        # Create merged folder
-        merged_dir = os.path.join(output_root, "merged")
-        os.makedirs(merged_dir, exist_ok=True)
-        
-        # Collect all scene mp4 files with their keyframe paths
-        all_items = []  # (video_path, keyframe_path)
-        for video_folder in sorted(os.listdir(output_root)):
-            folder_path = os.path.join(output_root, video_folder)
-            if os.path.isdir(folder_path) and video_folder != "merged":
-                keyframes_folder = os.path.join(folder_path, "keyframes")
-                scene_files = sorted([f for f in os.listdir(folder_path) if f.endswith('.mp4')])
-                for sf in scene_files:
-                    video_path = os.path.join(folder_path, sf)
-                    # Keyframe has same name but .jpg extension
-                    kf_name = sf.replace('.mp4', '.jpg')
-                    kf_path = os.path.join(keyframes_folder, kf_name) if os.path.exists(keyframes_folder) else ""
-                    all_items.append((video_path, kf_path))
-        
+        all_items = collect_scene_files(output_root)
         if not all_items:
             QMessageBox.information(self, "提示", "未找到任何分割视频")
             return
         
         # Copy videos and existing keyframes (no re-extraction needed!)
-        copied = 0
-        thumb_dir = os.path.join(merged_dir, "thumbnails")
-        os.makedirs(thumb_dir, exist_ok=True)
-        
-        for idx, (src_video, src_keyframe) in enumerate(all_items, start=1):
-            new_name = f"{idx:03d}.mp4"
-            thumb_name = f"{idx:03d}.jpg"
-            dst_path = os.path.join(merged_dir, new_name)
-            thumb_path = os.path.join(thumb_dir, thumb_name)
-            try:
-                # Copy video
-                shutil.copy2(src_video, dst_path)
-                
-                # Copy existing keyframe (fast!) instead of extracting
-                if src_keyframe and os.path.exists(src_keyframe):
-                    shutil.copy2(src_keyframe, thumb_path)
-                
-                copied += 1
-            except Exception as e:
-                self.append_log(f"复制失败: {src_video} -> {e}")
+        merged_dir, copied, errors = merge_export(output_root, all_items)
+        for src_video, e in errors:
+            self.append_log(f"复制失败: {src_video} -> {e}")
         
         QMessageBox.information(self, "合并完成", f"已将 {copied} 个视频和缩略图复制到:\n{merged_dir}")
         self.append_log(f"合并导出完成: {copied} 个文件 -> {merged_dir}")
@@ -1,19 +1,29 @@
 import math
 import os
+import subprocess
+from collections import deque
 
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '1'
 
 import numpy as np
-import tensorflow as tf
 # from moviepy import VideoFileClip 
 from moviepy import VideoFileClip
-import moviepy.video.fx as vfx 
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import cross_platform_popen_params
 
 
 class TransNetV2:
 
-    def __init__(self, model_dir=None):
+    def __init__(self, model_dir=None, batch_size=1, compiled=False, jit_compile=False,
+                 backend=None, **backend_options):
+        """
+        backend: 推理后端名称 (见 core.backends)，默认 "savedmodel"；"tflite-int8" 使用量化后的 TFLite 模型。
+        compiled / jit_compile 只作用于 savedmodel 后端: 推理走固定输入签名的 tf.function，
+        jit_compile 另外用 XLA 编译该图。图按 batch_size 追踪 / 编译一次 (可用 `warmup` 提前完成)，
+        不满的批补齐到该大小，不会因视频长度不同而重新编译。
+        其余 backend_options (如 cache_dir、num_threads) 传给后端。
+        """
         if model_dir is None:
             # model_dir = os.path.join(os.path.dirname(__file__), "transnetv2-weights/")
             model_dir = "transnetv2-weights/"
@@ -22,64 +32,198 @@ class TransNetV2:
             else:
                 print(f"[TransNetV2] Using weights from {model_dir}.")
 
+        self._model_dir = model_dir
         self._input_size = (27, 48, 3)
+        self._batch_size = max(1, int(batch_size))
+        self._predictor = None
         try:
-            self._model = tf.saved_model.load(model_dir)
-        except OSError as exc:
-            raise IOError(f"[TransNetV2] It seems that files in {model_dir} are corrupted or missing. "
-                          f"Re-download them manually and retry. For more info, see: "
-                          f"https://github.com/soCzech/TransNetV2/issues/1#issuecomment-647357796") from exc
+            from core.backends import create_backend
+        except ImportError:
+            # Fallback if run directly from another directory
+            import sys
+            sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+            from core.backends import create_backend
+        self._backend = create_backend(backend, model_dir, compiled=compiled, jit_compile=jit_compile,
+                                       batch_size=self._batch_size, **backend_options)
+        self._backend_name = self._backend.name
+
+    @classmethod
+    def with_predictor(cls, predictor, model_dir=None, batch_size=1, backend=None):
+        """
+        不在本进程加载模型: 推理交给 predictor(windows) -> (single_frame_pred, all_frames_pred)，
+        输入输出与 `predict_batch` 相同 (例如本机推理守护进程的客户端)；backend 为 predictor 背后的后端名称
+        """
+        model = cls.__new__(cls)
+        model._model_dir = model_dir
+        model._input_size = (27, 48, 3)
+        model._batch_size = max(1, int(batch_size))
+        model._backend = None
+        model._backend_name = backend or "savedmodel"
+        model._predictor = predictor
+        return model
+
+    def warmup(self, batch_size=None):
+        """用一批全零窗口跑一次推理，让图追踪、XLA 编译与内存分配提前完成"""
+        batch_size = self._batch_size if batch_size is None else max(1, int(batch_size))
+        self.predict_batch(np.zeros((batch_size, 100) + self._input_size, dtype=np.uint8))
+
+    @property
+    def backend(self):
+        return self._backend_name
 
     def predict_raw(self, frames: np.ndarray):
         assert len(frames.shape) == 5 and frames.shape[2:] == self._input_size, \
             "[TransNetV2] Input shape must be [batch, frames, height, width, 3]."
-        frames = tf.cast(frames, tf.float32)
+        return self._backend.predict_raw(frames)
 
-        logits, dict_ = self._model(frames)
-        single_frame_pred = tf.sigmoid(logits)
-        all_frames_pred = tf.sigmoid(dict_["many_hot"])
+    def predict_batch(self, windows: np.ndarray):
+        """[B, 100, 27, 48, 3] uint8 窗口 -> numpy 的 (single_frame_pred, all_frames_pred)，形状均为 [B, 100, 1]"""
+        if self._predictor is not None:
+            return self._predictor(windows)
+        single_frame_pred, all_frames_pred = self.predict_raw(windows)
+        return np.asarray(single_frame_pred), np.asarray(all_frames_pred)
 
-        return single_frame_pred, all_frames_pred
+    @staticmethod
+    def _iter_windows(chunks):
+        """
+        从帧块迭代器生成 100 帧的滑动窗口 (步长 50)，前后各 25 帧上下文
+
+        与一次性在首尾补齐帧再切片的结果完全相同，但只保留尚未用完的帧，
+        产出 (window, no_valid)，no_valid 为窗口中间 50 帧里属于视频本身的帧数。
+        """
+        buffer = None  # padded frames, starting at the first frame of the next window
+        no_frames = 0
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            no_frames += len(chunk)
+            if buffer is None:
+                # the first window is padded by copies of the first frame
+                buffer = np.concatenate([np.repeat(chunk[:1], 25, 0), chunk], 0)
+            else:
+                buffer = np.concatenate([buffer, chunk], 0)
+
+            # a full window only contains real frames once the next 25 frames are known
+            while len(buffer) >= 100:
+                yield buffer[:100], 50
+                buffer = buffer[50:]
+
+        if buffer is None:
+            return
 
-    def predict_frames(self, frames: np.ndarray):
+        # the last window must be padded by copies of the last frame of the video
+        no_padded_frames_end = 25 + 50 - (no_frames % 50 if no_frames % 50 != 0 else 50)  # 25 - 74
+        buffer = np.concatenate([buffer, np.repeat(buffer[-1:], no_padded_frames_end, 0)], 0)
+
+        no_remaining = len(buffer) - 25 - no_padded_frames_end
+        while len(buffer) >= 100:
+            yield buffer[:100], min(50, no_remaining)
+            no_remaining -= 50
+            buffer = buffer[50:]
+
+    def _predict_windows(self, windows, batch_size=None):
+        """
+        将 (window, no_valid) 迭代器按 batch_size 个窗口堆叠为 [B, 100, 27, 48, 3] 送入模型，
+        再按窗口拆分，依次产出每个窗口中间有效帧的 (single_frame_pred, all_frames_pred)
+        """
+        batch_size = self._batch_size if batch_size is None else max(1, int(batch_size))
+
+        def run_batch(batch):
+            single_frame_pred, all_frames_pred = self.predict_batch(np.stack([w for w, _ in batch]))
+            for i, (_, no_valid) in enumerate(batch):
+                yield (single_frame_pred[i, 25:25 + no_valid, 0],
+                       all_frames_pred[i, 25:25 + no_valid, 0])
+
+        batch = []
+        for window, no_valid in windows:
+            assert window.shape[1:] == self._input_size, \
+                "[TransNetV2] Input shape must be [frames, height, width, 3]."
+            batch.append((window, no_valid))
+            if len(batch) == batch_size:
+                yield from run_batch(batch)
+                batch = []
+
+        # the tail batch may hold fewer windows than batch_size
+        if batch:
+            yield from run_batch(batch)
+
+    def predict_frames_stream(self, chunks, batch_size=None):
+        """
+        逐窗口预测帧块迭代器 (chunks 中每块为 [frames, 27, 48, 3])
+
+        每完成一个 50 帧窗口就产出一段 (single_frame_pred, all_frames_pred)，
+        内存占用与视频长度无关，拼接后的结果与 `predict_frames` 完全一致。
+        """
+        yield from self._predict_windows(self._iter_windows(chunks), batch_size)
+
+    def predict_frames(self, frames: np.ndarray, batch_size=None, progress=None):
+        """
+        progress(done, total): 每个窗口的结果产出后以已预测帧数调用；在其中抛出异常即中止推理，
+        最多多算完当前这一批
+        """
         assert len(frames.shape) == 4 and frames.shape[1:] == self._input_size, \
             "[TransNetV2] Input shape must be [frames, height, width, 3]."
 
-        def input_iterator():
-            # return windows of size 100 where the first/last 25 frames are from the previous/next batch
-            # the first and last window must be padded by copies of the first and last frame of the video
-            no_padded_frames_start = 25
-            no_padded_frames_end = 25 + 50 - (len(frames) % 50 if len(frames) % 50 != 0 else 50)  # 25 - 74
-
-            start_frame = np.expand_dims(frames[0], 0)
-            end_frame = np.expand_dims(frames[-1], 0)
-            padded_inputs = np.concatenate(
-                [start_frame] * no_padded_frames_start + [frames] + [end_frame] * no_padded_frames_end, 0
-            )
-
-            ptr = 0
-            while ptr + 100 <= len(padded_inputs):
-                out = padded_inputs[ptr:ptr + 100]
-                ptr += 50
-                yield out[np.newaxis]
+        # feed the video in window-sized chunks so no padded copy of the whole video is made
+        chunks = (frames[i:i + 50] for i in range(0, len(frames), 50))
 
         predictions = []
+        no_processed = 0
 
-        for inp in input_iterator():
-            single_frame_pred, all_frames_pred = self.predict_raw(inp)
-            predictions.append((single_frame_pred.numpy()[0, 25:75, 0],
-                                all_frames_pred.numpy()[0, 25:75, 0]))
+        for single_, all_ in self.predict_frames_stream(chunks, batch_size):
+            predictions.append((single_, all_))
+            no_processed += len(single_)
 
             print("\r[TransNetV2] Processing video frames {}/{}".format(
-                min(len(predictions) * 50, len(frames)), len(frames)
+                no_processed, len(frames)
             ), end="")
+            if progress is not None:
+                progress(no_processed, len(frames))
 
         print("\n")
 
         single_frame_pred = np.concatenate([single_ for single_, all_ in predictions])
         all_frames_pred = np.concatenate([all_ for single_, all_ in predictions])
 
-        return single_frame_pred[:len(frames)], all_frames_pred[:len(frames)]  # remove extra padded frames
+        return single_frame_pred, all_frames_pred
+
+    def predict_many(self, videos, batch_size=None, progress=None):
+        """
+        批量预测多个视频 (videos 为 [frames, 27, 48, 3] 数组的列表)
+
+        不同视频的窗口被打包进同一批推理，短视频也能填满 batch，
+        预测结果按视频和帧偏移拆回，返回与各视频 `predict_frames` 相同的
+        [(single_frame_pred, all_frames_pred), ...]。
+        progress(index, done, total): 第 index 个视频已预测 done/total 帧；抛出异常即中止推理。
+        """
+        owners = deque()
+
+        def input_iterator():
+            for idx, frames in enumerate(videos):
+                assert len(frames.shape) == 4 and frames.shape[1:] == self._input_size, \
+                    "[TransNetV2] Input shape must be [frames, height, width, 3]."
+                chunks = (frames[i:i + 50] for i in range(0, len(frames), 50))
+                for window in self._iter_windows(chunks):
+                    owners.append(idx)
+                    yield window
+
+        predictions = [[] for _ in videos]
+        done = [0] * len(videos)
+        for single_, all_ in self._predict_windows(input_iterator(), batch_size):
+            idx = owners.popleft()
+            predictions[idx].append((single_, all_))
+            done[idx] += len(single_)
+            if progress is not None:
+                progress(idx, done[idx], len(videos[idx]))
+
+        results = []
+        for preds in predictions:
+            if not preds:
+                results.append((np.zeros(0, np.float32), np.zeros(0, np.float32)))
+                continue
+            results.append((np.concatenate([single_ for single_, all_ in preds]),
+                            np.concatenate([all_ for single_, all_ in preds])))
+        return results
 
     def predict_video(self, video_fn: str):
         try:
@@ -97,9 +241,95 @@ class TransNetV2:
         video = np.frombuffer(video_stream, np.uint8).reshape([-1, 27, 48, 3])
         return (video, *self.predict_frames(video))
 
-    def predict_video_2(self, video_path):
+    def extract_frames(self, video_path, chunk_frames=256, progress=None, frame_store=None):
+        """
+        顺序解码视频为 [frames, 27, 48, 3] 的 uint8 数组
+
+        帧数与帧的对齐与逐帧 `clip.get_frame(t / fps)` 相同，但只启动一个已缩放到 48x27 的 rawvideo 管道，
+        按块直接读入预分配的缓冲区。像素值与原实现不完全相同: 这里用 ffmpeg 的 lanczos 缩放，原实现是
+        MoviePy 全尺寸解码后用 PIL LANCZOS 缩放，单个像素最多相差约 20 (平均约 0.2~0.4)，阈值附近的
+        预测值可能因此越过阈值。用 `python -m benchmarks.check_decode` 检查与原实现的差异。
+        progress(done, total): 每读入一块调用一次；在其中抛出异常会结束 ffmpeg 进程并中止解码。
+        frame_store: core.framestore.FrameStore，给出时帧直接解码到磁盘上的 .npy 文件并返回只读的
+        内存映射数组；该视频已存储过时不再解码。
+        """
+        if frame_store is not None:
+            stored = frame_store.load(video_path, self._input_size)
+            if stored is not None:
+                return stored
+
+        # 帧数与旧实现保持一致: 时长截断到 0.1s 后乘以帧率
+        with VideoFileClip(video_path, audio=False) as clip:
+            fps = clip.fps
+            duration = math.floor(clip.duration * 10) / 10
+        no_frames = int(duration * fps)
+
+        shape = (no_frames,) + self._input_size
+        if frame_store is not None and no_frames > 0:
+            return frame_store.write(video_path, shape,
+                                     lambda video: self._decode_into(video_path, video, chunk_frames, progress))
+        video = np.empty(shape, dtype=np.uint8)
+        if no_frames > 0:
+            self._decode_into(video_path, video, chunk_frames, progress)
+        return video
+
+    def _decode_into(self, video_path, video, chunk_frames=256, progress=None):
+        """把视频的前 len(video) 帧解码到 video (可以是内存映射数组) 中"""
+        no_frames = len(video)
+        height, width, channels = self._input_size
+        frame_size = height * width * channels
+
+        cmd = [
+            FFMPEG_BINARY, "-loglevel", "error",
+            "-i", video_path,
+            "-an", "-sn",
+            # MoviePy's Resize scales RGB frames with PIL LANCZOS: same color space and filter family here,
+            # but swscale's lanczos does not reproduce PIL's values exactly (see extract_frames)
+            "-vf", f"format=rgb24,scale={width}:{height}:flags=lanczos",
+            "-frames:v", str(no_frames),
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+        ]
+        proc = subprocess.Popen(cmd, **cross_platform_popen_params({
+            "stdout": subprocess.PIPE,
+            "stderr": subprocess.PIPE,
+            "stdin": subprocess.DEVNULL,
+            "bufsize": chunk_frames * frame_size,
+        }))
+
+        buffer = memoryview(video).cast("B")
+        offset, total = 0, len(buffer)
+        try:
+            while offset < total:
+                read = proc.stdout.readinto(buffer[offset:min(offset + chunk_frames * frame_size, total)])
+                if not read:
+                    break
+                offset += read
+                if progress is not None:
+                    progress(offset // frame_size, no_frames)
+        except BaseException:
+            # aborted: do not wait for ffmpeg to decode the rest of the video
+            proc.kill()
+            raise
+        finally:
+            buffer.release()
+            proc.stdout.close()
+            err = proc.stderr.read().decode("utf-8", "ignore")
+            proc.stderr.close()
+            proc.wait()
+
+        frames_read = offset // frame_size
+        if frames_read == 0:
+            raise IOError(f"[TransNetV2] ffmpeg failed to decode {video_path}: {err.strip()}")
+        if frames_read < no_frames:
+            # MoviePy 在超出末尾时返回最后一帧，这里保持相同行为
+            video[frames_read:] = video[frames_read - 1]
+        return video
+
+    def predict_video_2(self, video_path, frame_store=None):
         """
         预测视频中的场景转换
+
+        frame_store 见 `extract_frames`: 给出时返回的 video_frames 是磁盘上的内存映射数组。
         """
         # 确保视频路径格式正确
         video_path = os.path.normpath(video_path).replace('\\', '/')
@@ -111,16 +341,7 @@ class TransNetV2:
             raise FileNotFoundError(f"视频文件不存在: {video_path}")
         
         try:
-            clip = VideoFileClip(video_path)
-            clip = clip.with_effects([vfx.Resize(new_size=(48, 27))])
-            duration = math.floor(clip.duration * 10) / 10
-            fps = clip.fps  # 视频的帧率
-            frames = []
-            for t in range(0, int(duration * fps)):
-                frame = clip.get_frame(t / fps)  # 获取当前时间点的帧
-                if len(frame) != 0:  # 如果帧的长度不为零
-                    frames.append(frame)  # 将帧添加到 frames 列表中
-            video = np.array(frames, dtype=np.uint8)
+            video = self.extract_frames(video_path, frame_store=frame_store)
             return video, *self.predict_frames(video)
         except Exception as e:
             print(f"[TransNetV2] Error processing video: {str(e)}")
@@ -128,6 +349,66 @@ class TransNetV2:
 
     @staticmethod
     def predictions_to_scenes(predictions: np.ndarray, threshold: float = 0.5):
+        """
+        A scene is a run of frames below the threshold, extended by the first frame of the following
+        transition: [run_start, run_end]. A run reaching the end of the video ends at the last frame
+        and a trailing transition is dropped. If no frame is below the threshold the whole video is
+        a single scene. Same output as `_predictions_to_scenes_loop`.
+        """
+        predictions = np.asarray(predictions).reshape(-1)
+        n = len(predictions)
+        if n == 0:
+            return np.array([[0, -1]], dtype=np.int32)
+
+        # pad both ends with a transition frame: -1 edges mark the start of a run of scene frames,
+        # +1 edges the (exclusive) end of it
+        transitions = np.ones(n + 2, dtype=np.int8)
+        transitions[1:-1] = predictions > threshold
+        edges = np.diff(transitions)
+        starts = np.flatnonzero(edges == -1)
+        if len(starts) == 0:
+            # just fix if all predictions are 1
+            return np.array([[0, n - 1]], dtype=np.int32)
+        ends = np.minimum(np.flatnonzero(edges == 1), n - 1)
+        return np.stack([starts, ends], axis=1).astype(np.int32)
+
+    @staticmethod
+    def predictions_to_scenes_sweep(predictions: np.ndarray, thresholds):
+        """
+        Scene lists for a vector of thresholds, in the order of `thresholds`; entry i equals
+        `predictions_to_scenes(predictions, float(thresholds[i]))`. All thresholds are applied in one
+        comparison and the transition edges of all of them come from one pass over [thresholds, frames];
+        only the split into per-threshold scene lists is done row by row.
+        """
+        predictions = np.asarray(predictions).reshape(-1)
+        # compared like a Python float threshold: in the dtype of float predictions
+        dtype = predictions.dtype if np.issubdtype(predictions.dtype, np.floating) else np.float64
+        thresholds = np.asarray(thresholds, dtype=dtype).reshape(-1)
+        n = len(predictions)
+        if n == 0:
+            return [np.array([[0, -1]], dtype=np.int32) for _ in thresholds]
+
+        scenes = []
+        # bound the [thresholds, frames] arrays to about 64 MB per block on multi-hour videos
+        rows = max(1, (1 << 26) // (n + 2))
+        for first in range(0, len(thresholds), rows):
+            block = thresholds[first:first + rows]
+            transitions = np.ones((len(block), n + 2), dtype=bool)
+            np.greater(predictions[None, :], block[:, None], out=transitions[:, 1:-1])
+            edges = transitions[:, 1:] != transitions[:, :-1]
+            for row in edges:
+                # padded with a transition at both ends, so the edges alternate run start, (exclusive) run end
+                runs = np.flatnonzero(row).astype(np.int32).reshape(-1, 2)
+                if len(runs) == 0:
+                    # just fix if all predictions are 1
+                    runs = np.array([[0, n - 1]], dtype=np.int32)
+                np.minimum(runs[:, 1], n - 1, out=runs[:, 1])
+                scenes.append(runs)
+        return scenes
+
+    @staticmethod
+    def _predictions_to_scenes_loop(predictions: np.ndarray, threshold: float = 0.5):
+        # original per-frame implementation, kept as the reference for predictions_to_scenes
         predictions = (predictions > threshold).astype(np.uint8)
 
         scenes = []
@@ -157,18 +438,19 @@ class TransNetV2:
         ih, iw, ic = frames.shape[1:]
         width = 25
 
-        # pad frames so that length of the video is divisible by width
-        # pad frames also by len(predictions) pixels in width in order to show predictions
+        # pad the video to a multiple of width frames, and each frame by one pixel row and
+        # len(predictions) pixel columns in order to show predictions
         pad_with = width - len(frames) % width if len(frames) % width != 0 else 0
-        frames = np.pad(frames, [(0, pad_with), (0, 1), (0, len(predictions)), (0, 0)])
-
         predictions = [np.pad(x, (0, pad_with)) for x in predictions]
-        height = len(frames) // width
+        height = (len(frames) + pad_with) // width
 
-        img = frames.reshape([height, width, ih + 1, iw + len(predictions), ic])
-        img = np.concatenate(np.split(
-            np.concatenate(np.split(img, height), axis=2)[0], width
-        ), axis=2)[0, :-1]
+        img = np.zeros((height * (ih + 1), width * (iw + len(predictions)), ic), dtype=frames.dtype)
+        cells = img.reshape([height, ih + 1, width, iw + len(predictions), ic])
+        for row in range(height):
+            # one row of frames at a time: a memory-mapped video is never read into memory whole
+            block = np.asarray(frames[row * width:(row + 1) * width])
+            cells[row, :ih, :len(block), :iw] = block.transpose(1, 0, 2, 3)
+        img = img[:-1]
 
         img = Image.fromarray(img)
         draw = ImageDraw.Draw(img)
@@ -197,19 +479,57 @@ def main():
     parser.add_argument("files", type=str, nargs="+", help="path to video files to process")
     parser.add_argument("--weights", type=str, default=None,
                         help="path to TransNet V2 weights, tries to infer the location if not specified")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="number of 100-frame windows passed to the model per call")
+    parser.add_argument("--backend", type=str, default=None, choices=["savedmodel", "tflite-int8"],
+                        help="inference backend (default: savedmodel)")
+    parser.add_argument("--compiled", action="store_true",
+                        help="run inference through a tf.function with a fixed input signature")
+    parser.add_argument("--xla", action="store_true", help="also compile the inference graph with XLA")
     parser.add_argument('--visualize', action="store_true",
                         help="save a png file with prediction visualization for each extracted video")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="prediction cache directory (default: $TRANSVIDEO_CACHE_DIR or the user cache dir)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always run inference and do not store predictions in the cache")
+    parser.add_argument("--frame-store", type=str, nargs="?", const="", default=None, metavar="DIR",
+                        help="keep decoded frames in memory-mapped .npy files in DIR (default: <cache dir>/frames) "
+                             "instead of RAM, and reuse them in later runs")
     args = parser.parse_args()
 
-    model = TransNetV2(args.weights)
+    model = TransNetV2(args.weights, batch_size=args.batch_size, compiled=args.compiled, jit_compile=args.xla,
+                       backend=args.backend, cache_dir=args.cache_dir)
+    frame_store = None
+    if args.frame_store is not None:
+        from core.cache import default_cache_dir
+        from core.framestore import FrameStore
+        frame_store = FrameStore(args.frame_store or os.path.join(args.cache_dir or default_cache_dir(), "frames"))
+    cache = None
+    if not args.no_cache:
+        from core.cache import PredictionCache, prediction_model_id
+        # the frame store decodes with extract_frames, otherwise predict_video's ffmpeg-python decode is used
+        decoder = "extract_frames" if frame_store is not None else "predict_video"
+        cache = PredictionCache(args.cache_dir, prediction_model_id(model._model_dir, model.backend, decoder))
     for file in args.files:
         if os.path.exists(file + ".predictions.txt") or os.path.exists(file + ".scenes.txt"):
             print(f"[TransNetV2] {file}.predictions.txt or {file}.scenes.txt already exists. "
                   f"Skipping video {file}.", file=sys.stderr)
             continue
 
-        video_frames, single_frame_predictions, all_frame_predictions = \
-            model.predict_video(file)
+        cached = cache.get(file) if cache is not None else None
+        if cached is not None:
+            print(f"[TransNetV2] Using cached predictions for {file}.")
+            single_frame_predictions, all_frame_predictions = cached
+            video_frames = None
+        else:
+            if frame_store is not None:
+                video_frames, single_frame_predictions, all_frame_predictions = \
+                    model.predict_video_2(file, frame_store=frame_store)
+            else:
+                video_frames, single_frame_predictions, all_frame_predictions = \
+                    model.predict_video(file)
+            if cache is not None:
+                cache.put(file, single_frame_predictions, all_frame_predictions)
 
         predictions = np.stack([single_frame_predictions, all_frame_predictions], 1)
         np.savetxt(file + ".predictions.txt", predictions, fmt="%.6f")
@@ -223,6 +543,8 @@ def main():
                       f"Skipping visualization of video {file}.", file=sys.stderr)
                 continue
 
+            if video_frames is None:
+                video_frames = model.extract_frames(file, frame_store=frame_store)
             pil_image = model.visualize_predictions(
                 video_frames, predictions=(single_frame_predictions, all_frame_predictions))
             pil_image.save(file + ".vis.png")